@@ -0,0 +1,393 @@
+"""
+Модуль backup_index с локальным индексом резервного копирования на SQLite.
+
+Индекс хранит для каждой фотографии профиля VK состояние передачи:
+    new        - фотография найдена, но еще не скачана;
+    downloaded - фотография сохранена в локальную папку 'photo';
+    uploaded   - фотография загружена на Яндекс.Диск.
+
+Повторный запуск пропускает уже загруженные фотографии, а после аварийного
+завершения продолжает с того места, где остановился: скачанные, но не загруженные
+файлы только загружаются. Если у фотографии изменилась дата или выбранный размер
+(version), она передается заново.
+
+Состояние хранится отдельно для каждого места назначения (destination): Яндекс.Диска,
+определяемого по токену, и папки на нем. Поэтому копирование того же профиля в другую
+папку или на другой диск выполняется заново. Записи, созданные до появления
+destination, получают пустое место назначения.
+
+Для альбомов индекс хранит размер и время изменения (updated из photos.getAlbums)
+на момент последнего полного копирования, что позволяет пропускать неизмененные
+альбомы без запросов photos.get.
+
+Таблица hashes связывает SHA-256 содержимого с путем уже загруженного файла
+на Яндекс.Диске, что позволяет не загружать повторно одинаковые фотографии
+из разных альбомов и профилей. Пути хранятся отдельно для каждого Яндекс.Диска
+(account), поэтому файл другого диска никогда не считается дубликатом.
+
+Пример использования:
+    index = BackupIndex('backup_index.sqlite3')
+    destination = BackupIndex.destination(token_yand, 'image')
+    if index.register(owner_id, album_id, photo_id, url, version,
+                      destination) != BackupIndex.UPLOADED:
+        ...
+    index.mark_uploaded(owner_id, photo_id, 'image/photo_1.jpg', destination=destination)
+"""
+import hashlib
+import sqlite3
+import threading
+from time import time
+
+
+class BackupIndex:
+    """
+    Потокобезопасный индекс состояния фотографий в файле SQLite.
+
+    Attributes:
+        path (str): Путь к файлу базы данных.
+    """
+    NEW = 'new'
+    DOWNLOADED = 'downloaded'
+    UPLOADED = 'uploaded'
+
+    _schema = {
+        'photos': 'CREATE TABLE IF NOT EXISTS photos ('
+                  ' owner_id TEXT NOT NULL,'
+                  ' destination TEXT NOT NULL,'
+                  ' photo_id TEXT NOT NULL,'
+                  ' album_id TEXT,'
+                  ' url TEXT,'
+                  ' version TEXT,'
+                  ' state TEXT NOT NULL,'
+                  ' file_name TEXT,'
+                  ' remote_path TEXT,'
+                  ' updated_at REAL,'
+                  ' sha256 TEXT,'
+                  ' PRIMARY KEY (owner_id, destination, photo_id))',
+        'albums': 'CREATE TABLE IF NOT EXISTS albums ('
+                  ' owner_id TEXT NOT NULL,'
+                  ' destination TEXT NOT NULL,'
+                  ' album_id TEXT NOT NULL,'
+                  ' size INTEGER,'
+                  ' updated INTEGER,'
+                  ' quantity INTEGER,'
+                  ' backed_up_at REAL,'
+                  ' PRIMARY KEY (owner_id, destination, album_id))',
+        'hashes': 'CREATE TABLE IF NOT EXISTS hashes ('
+                  ' account TEXT NOT NULL,'
+                  ' sha256 TEXT NOT NULL,'
+                  ' remote_path TEXT NOT NULL,'
+                  ' size INTEGER,'
+                  ' PRIMARY KEY (account, sha256))',
+    }
+
+    def __init__(self, path: str = 'backup_index.sqlite3'):
+        """
+        Открывает (или создает) базу данных индекса.
+
+        Args:
+            path (str, optional): Путь к файлу базы. По умолчанию 'backup_index.sqlite3'.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._migrate()
+            for statement in self._schema.values():
+                self._connection.execute(statement)
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS photos_file_name ON photos (file_name)')
+
+    def _migrate(self):
+        """
+        Переводит таблицы старой схемы на новую: photos и albums - на ключ с destination,
+        hashes - на ключ с account.
+
+        Первичный ключ в SQLite изменить нельзя, поэтому таблица пересоздается, а записи
+        копируются с пустым местом назначения (Яндекс.Диском).
+        """
+        for table, key in (('photos', 'destination'), ('albums', 'destination'),
+                           ('hashes', 'account')):
+            columns = [row[1] for row in self._connection.execute(f'PRAGMA table_info({table})')]
+            if not columns or key in columns:
+                continue
+            self._connection.execute('DROP INDEX IF EXISTS photos_file_name')
+            self._connection.execute(f'ALTER TABLE {table} RENAME TO {table}_old')
+            self._connection.execute(self._schema[table])
+            names = ', '.join(columns)
+            self._connection.execute(
+                f"INSERT INTO {table} ({key}, {names}) SELECT '', {names} FROM {table}_old")
+            self._connection.execute(f'DROP TABLE {table}_old')
+
+    @staticmethod
+    def account(token: str):
+        """
+        Формирует идентификатор Яндекс.Диска для индекса.
+
+        Токен не сохраняется в индексе - используется начало его SHA-256.
+
+        Args:
+            token (str): Токен OAuth Яндекс.Диска.
+
+        Returns:
+            str: Идентификатор диска.
+        """
+        return hashlib.sha256(str(token).encode('utf-8')).hexdigest()[:16]
+
+    @classmethod
+    def destination(cls, token: str, folder: str):
+        """
+        Формирует место назначения для индекса: Яндекс.Диск и папку на нем.
+
+        Args:
+            token (str): Токен OAuth Яндекс.Диска.
+            folder (str): Папка на Яндекс.Диске.
+
+        Returns:
+            str: Место назначения вида '<account(token)>:<папка>'.
+        """
+        return f"{cls.account(token)}:{folder}"
+
+    def register(self, owner_id, album_id, photo_id, url: str, version: str,
+                 destination: str = ''):
+        """
+        Регистрирует фотографию, найденную в альбоме, и возвращает ее состояние.
+
+        Если фотография уже есть в индексе с той же версией, состояние сохраняется.
+        Если версия изменилась, фотография снова получает состояние new.
+
+        Args:
+            owner_id: ID владельца фотографии.
+            album_id: ID альбома.
+            photo_id: ID фотографии.
+            url (str): URL выбранного размера.
+            version (str): Дата и тип выбранного размера фотографии.
+            destination (str, optional): Место назначения (destination()). По умолчанию пустое.
+
+        Returns:
+            str: NEW, DOWNLOADED или UPLOADED.
+        """
+        key = (str(owner_id), destination, str(photo_id))
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                'SELECT version, state FROM photos'
+                ' WHERE owner_id = ? AND destination = ? AND photo_id = ?', key).fetchone()
+            if row is not None and row[0] == version:
+                self._connection.execute(
+                    'UPDATE photos SET url = ?, album_id = ?'
+                    ' WHERE owner_id = ? AND destination = ? AND photo_id = ?',
+                    (url, str(album_id), *key))
+                return row[1]
+
+            self._connection.execute(
+                'INSERT OR REPLACE INTO photos (owner_id, destination, photo_id, album_id, url,'
+                ' version, state, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (*key, str(album_id), url, version, self.NEW, time()))
+            return self.NEW
+
+    def state(self, owner_id, photo_id, destination: str = ''):
+        """
+        Возвращает состояние фотографии.
+
+        Args:
+            owner_id: ID владельца фотографии.
+            photo_id: ID фотографии.
+            destination (str, optional): Место назначения (destination()). По умолчанию пустое.
+
+        Returns:
+            str or None: Состояние или None, если фотографии нет в индексе.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT state FROM photos WHERE owner_id = ? AND destination = ? AND photo_id = ?',
+                (str(owner_id), destination, str(photo_id))).fetchone()
+        return row[0] if row is not None else None
+
+    def mark_downloaded(self, owner_id, photo_id, file_name: str, sha256: str = None,
+                        destination: str = ''):
+        """
+        Отмечает, что фотография сохранена в локальный файл file_name.
+
+        Args:
+            owner_id: ID владельца фотографии.
+            photo_id: ID фотографии.
+            file_name (str): Имя файла в папке 'photo'.
+            sha256 (str, optional): SHA-256 содержимого файла.
+            destination (str, optional): Место назначения (destination()). По умолчанию пустое.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                'UPDATE photos SET state = ?, file_name = ?, sha256 = ?, updated_at = ?'
+                ' WHERE owner_id = ? AND destination = ? AND photo_id = ?',
+                (self.DOWNLOADED, file_name, sha256, time(), str(owner_id), destination,
+                 str(photo_id)))
+
+    def mark_uploaded(self, owner_id, photo_id, remote_path: str, sha256: str = None,
+                      destination: str = ''):
+        """
+        Отмечает, что фотография загружена на Яндекс.Диск по пути remote_path.
+
+        Args:
+            owner_id: ID владельца фотографии.
+            photo_id: ID фотографии.
+            remote_path (str): Путь файла на Яндекс.Диске.
+            sha256 (str, optional): SHA-256 содержимого файла.
+            destination (str, optional): Место назначения (destination()). По умолчанию пустое.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                'UPDATE photos SET state = ?, remote_path = ?, sha256 = COALESCE(?, sha256),'
+                ' updated_at = ? WHERE owner_id = ? AND destination = ? AND photo_id = ?',
+                (self.UPLOADED, remote_path, sha256, time(), str(owner_id), destination,
+                 str(photo_id)))
+
+    def mark_uploaded_file(self, file_name: str, remote_path: str, destination: str = ''):
+        """
+        Отмечает загруженной скачанную фотографию по имени локального файла.
+
+        Args:
+            file_name (str): Имя файла в папке 'photo'.
+            remote_path (str): Путь файла на Яндекс.Диске.
+            destination (str, optional): Место назначения (destination()). По умолчанию пустое.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                'UPDATE photos SET state = ?, remote_path = ?, updated_at = ?'
+                ' WHERE file_name = ? AND destination = ? AND state = ?',
+                (self.UPLOADED, remote_path, time(), file_name, destination, self.DOWNLOADED))
+
+    def file_hash(self, file_name: str, destination: str = ''):
+        """
+        Возвращает SHA-256 скачанного файла, сохраненный при скачивании.
+
+        Args:
+            file_name (str): Имя файла в папке 'photo'.
+            destination (str, optional): Место назначения (destination()). По умолчанию пустое.
+
+        Returns:
+            str or None: SHA-256 или None, если он неизвестен.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT sha256 FROM photos WHERE file_name = ? AND destination = ? AND state = ?',
+                (file_name, destination, self.DOWNLOADED)).fetchone()
+        return row[0] if row is not None else None
+
+    def remote_for_hash(self, sha256: str, account: str = ''):
+        """
+        Ищет на Яндекс.Диске уже загруженный файл с тем же содержимым.
+
+        Args:
+            sha256 (str): SHA-256 содержимого.
+            account (str, optional): Яндекс.Диск (account()). По умолчанию пустой.
+
+        Returns:
+            str or None: Путь файла на Яндекс.Диске или None.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT remote_path FROM hashes WHERE account = ? AND sha256 = ?',
+                (account, sha256)).fetchone()
+        return row[0] if row is not None else None
+
+    def save_hash(self, sha256: str, remote_path: str, size: int, account: str = ''):
+        """
+        Запоминает, что файл с содержимым sha256 загружен по пути remote_path.
+
+        Args:
+            sha256 (str): SHA-256 содержимого.
+            remote_path (str): Путь файла на Яндекс.Диске.
+            size (int): Размер файла в байтах.
+            account (str, optional): Яндекс.Диск (account()). По умолчанию пустой.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR IGNORE INTO hashes (account, sha256, remote_path, size)'
+                ' VALUES (?, ?, ?, ?)', (account, sha256, remote_path, size))
+
+    def drop_hash(self, sha256: str, account: str = ''):
+        """
+        Забывает загруженный файл (например, если его удалили с Яндекс.Диска).
+
+        Args:
+            sha256 (str): SHA-256 содержимого.
+            account (str, optional): Яндекс.Диск (account()). По умолчанию пустой.
+        """
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM hashes WHERE account = ? AND sha256 = ?',
+                                     (account, sha256))
+
+    def album_unchanged(self, owner_id, album_id, size: int, updated, quantity: int,
+                        destination: str = ''):
+        """
+        Проверяет, что альбом не менялся с последнего полного копирования.
+
+        Args:
+            owner_id: ID владельца альбома.
+            album_id: ID альбома.
+            size (int): Текущее количество фотографий в альбоме.
+            updated (int or None): Текущее время изменения альбома (unixtime).
+            quantity (int): Сколько фотографий альбома нужно сохранить сейчас.
+            destination (str, optional): Место назначения (destination()). По умолчанию пустое.
+
+        Returns:
+            bool: True, если размер и время изменения совпадают с сохраненными, а в прошлый раз
+             было сохранено не меньше quantity фотографий.
+        """
+        if updated is None:
+            return False
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT size, updated, quantity FROM albums'
+                ' WHERE owner_id = ? AND destination = ? AND album_id = ?',
+                (str(owner_id), destination, str(album_id))).fetchone()
+        return row is not None and row[0] == size and row[1] == updated and row[2] >= quantity
+
+    def album_complete(self, owner_id, album_id, destination: str = ''):
+        """
+        Проверяет, что все зарегистрированные фотографии альбома загружены.
+
+        Args:
+            owner_id: ID владельца альбома.
+            album_id: ID альбома.
+            destination (str, optional): Место назначения (destination()). По умолчанию пустое.
+
+        Returns:
+            bool: True, если фотографии альбома есть в индексе и все они загружены.
+        """
+        with self._lock:
+            total, pending = self._connection.execute(
+                'SELECT COUNT(*), COUNT(NULLIF(state, ?)) FROM photos'
+                ' WHERE owner_id = ? AND destination = ? AND album_id = ?',
+                (self.UPLOADED, str(owner_id), destination, str(album_id))).fetchone()
+        return total > 0 and pending == 0
+
+    def save_album(self, owner_id, album_id, size: int, updated, quantity: int,
+                   destination: str = ''):
+        """
+        Запоминает состояние альбома после успешного копирования.
+
+        Args:
+            owner_id: ID владельца альбома.
+            album_id: ID альбома.
+            size (int): Количество фотографий в альбоме.
+            updated (int or None): Время изменения альбома (unixtime).
+            quantity (int): Сколько фотографий альбома сохранено.
+            destination (str, optional): Место назначения (destination()). По умолчанию пустое.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO albums (owner_id, destination, album_id, size, updated,'
+                ' quantity, backed_up_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (str(owner_id), destination, str(album_id), size, updated, quantity, time()))
+
+    def close(self):
+        """
+        Закрывает соединение с базой данных.
+        """
+        with self._lock:
+            self._connection.close()
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,288 @@
+"""
+Модуль bandwidth для ограничения скорости передачи фотографий по сети.
+
+BandwidthShaper ограничивает скорость в байтах в секунду отдельно для скачивания ('down')
+и загрузки ('up'). Ожидающие потоки обслуживаются по классам приоритета:
+    METADATA - ответы API VK и Яндекс.Диска (списки альбомов, ссылки, манифесты);
+    RECENT   - фотографии из альбомов, измененных за последние recent_days дней;
+    BULK     - остальные фотографии.
+Пока есть ожидающий поток более высокого класса, потоки низших классов не получают
+байты; внутри класса порядок - по очереди.
+
+Лимиты могут зависеть от времени суток: schedule - список окон вида
+    {'start': '09:00', 'end': '19:00', 'down': 1_000_000, 'up': 500_000}
+(окно может переходить через полночь). Вне окон действуют лимиты down и up.
+None означает отсутствие ограничения, 0 - паузу передачи в этом направлении.
+
+Ограничитель общий для процесса (shared()), поэтому лимит соблюдается всеми заданиями
+и потоками сразу.
+
+Пример использования:
+    shaper = BandwidthShaper.from_config({'down': 4_000_000, 'up': 2_000_000})
+    for chunk in shaper.throttle(response.iter_content(65536), 'down', shaper.RECENT):
+        f.write(chunk)
+"""
+import heapq
+import itertools
+import os
+import threading
+from datetime import datetime, time as day_time
+from time import monotonic, time
+
+from metrics import Metrics
+
+DIRECTIONS = ('down', 'up')
+
+
+class BandwidthShaper:
+    """
+    Потокобезопасный ограничитель скорости с классами приоритета и расписанием.
+
+    Attributes:
+        limits (dict): Лимиты вне окон расписания {'down': байт/с, 'up': байт/с}.
+        schedule (list): Окна расписания {'start', 'end', 'down', 'up'}.
+        recent_days (int): Альбомы, измененные за это число дней, получают класс RECENT.
+        burst (float): Сколько секунд передачи на полной скорости можно накопить.
+    """
+    METADATA = 0
+    RECENT = 1
+    BULK = 2
+    priority_names = {METADATA: 'metadata', RECENT: 'recent', BULK: 'bulk'}
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, down: float = None, up: float = None, schedule: list = None,
+                 recent_days: int = 30, burst: float = 1.0, metrics: Metrics = None):
+        """
+        Создает ограничитель.
+
+        Args:
+            down (float, optional): Скорость скачивания, байт/с. По умолчанию без ограничения.
+            up (float, optional): Скорость загрузки, байт/с. По умолчанию без ограничения.
+            schedule (list, optional): Окна расписания по времени суток.
+            recent_days (int, optional): Порог класса RECENT в днях. По умолчанию 30.
+            burst (float, optional): Запас на всплески в секундах. По умолчанию 1.
+            metrics (Metrics, optional): Сборщик метрик. По умолчанию общий.
+
+        Raises:
+            ValueError: Если окно расписания задано неверно.
+        """
+        self.metrics = metrics if metrics is not None else Metrics.shared()
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()
+        self._tokens = {direction: 0.0 for direction in DIRECTIONS}
+        self._updated = {direction: monotonic() for direction in DIRECTIONS}
+        self._waiters = {direction: [] for direction in DIRECTIONS}
+        self.configure(down, up, schedule, recent_days, burst)
+
+    @classmethod
+    def shared(cls):
+        """
+        Возвращает общий для процесса ограничитель (по умолчанию без ограничений),
+        создавая его при первом вызове.
+
+        Returns:
+            BandwidthShaper: Ограничитель.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Возвращает ограничитель по настройкам (например, из файла заданий).
+
+        Args:
+            config (dict or BandwidthShaper or None): Параметры configure(); словарь
+             применяется к общему ограничителю, None - общий ограничитель без изменений.
+
+        Returns:
+            BandwidthShaper: Ограничитель.
+        """
+        if isinstance(config, cls):
+            return config
+        shaper = cls.shared()
+        if config is not None:
+            shaper.configure(**config)
+        return shaper
+
+    def configure(self, down: float = None, up: float = None, schedule: list = None,
+                  recent_days: int = 30, burst: float = 1.0):
+        """
+        Задает лимиты и расписание (параметры как у __init__).
+        """
+        windows = [{**window, 'start': self._parse_time(window['start']),
+                    'end': self._parse_time(window['end'])} for window in schedule or []]
+        with self._condition:
+            self.limits = {'down': down, 'up': up}
+            self.schedule = windows
+            self.recent_days = recent_days
+            self.burst = burst
+            self._condition.notify_all()
+
+    @staticmethod
+    def _parse_time(value: str):
+        """
+        Разбирает время суток 'ЧЧ:ММ'.
+        """
+        try:
+            return day_time.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Неверное время в расписании: {value}") from None
+
+    @property
+    def limited(self):
+        """
+        True, если задан хотя бы один лимит или окно расписания.
+        """
+        return bool(self.schedule) or any(limit is not None for limit in self.limits.values())
+
+    def rate(self, direction: str):
+        """
+        Возвращает текущий лимит с учетом расписания.
+
+        Args:
+            direction (str): 'down' или 'up'.
+
+        Returns:
+            float or None: Байт в секунду или None, если скорость не ограничена.
+        """
+        now = datetime.now().time()
+        for window in self.schedule:
+            start, end = window['start'], window['end']
+            inside = start <= now < end if start <= end else (now >= start or now < end)
+            if inside and direction in window:
+                return window[direction]
+        return self.limits[direction]
+
+    def priority_for(self, updated):
+        """
+        Определяет класс приоритета фотографий альбома по времени его изменения.
+
+        Args:
+            updated (int or None): Время изменения альбома (unixtime).
+
+        Returns:
+            int: RECENT или BULK.
+        """
+        if updated and time() - updated < self.recent_days * 86400:
+            return self.RECENT
+        return self.BULK
+
+    def acquire(self, direction: str, size: int, priority: int = BULK):
+        """
+        Блокирует поток, пока не будет разрешено передать size байт.
+
+        Байты выдаются потоку, стоящему первым в очереди направления (наивысший класс,
+        затем порядок прихода). Баланс может уйти в минус на один блок: следующий поток
+        ждет, пока долг не будет погашен.
+
+        Args:
+            direction (str): 'down' или 'up'.
+            size (int): Количество байт.
+            priority (int, optional): Класс приоритета. По умолчанию BULK.
+        """
+        start = monotonic()
+        with self._condition:
+            waiters = self._waiters[direction]
+            if not waiters and self.rate(direction) is None:
+                return
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(waiters, ticket)
+            try:
+                while True:
+                    rate = self.rate(direction)
+                    self._refill(direction, rate)
+                    if waiters[0] == ticket and (rate is None or self._tokens[direction] > 0):
+                        heapq.heappop(waiters)
+                        if rate is not None:
+                            self._tokens[direction] -= size
+                        break
+                    if waiters[0] != ticket or not rate:
+                        # Ждем своей очереди или окончания паузы по расписанию.
+                        self._condition.wait(1.0)
+                    else:
+                        self._condition.wait(min(1.0, -self._tokens[direction] / rate or 0.001))
+            finally:
+                if ticket in waiters:
+                    waiters.remove(ticket)
+                    heapq.heapify(waiters)
+                self._condition.notify_all()
+
+        waited = monotonic() - start
+        if waited > 0.001:
+            self.metrics.inc('bandwidth_wait_seconds_total', waited, direction=direction,
+                             priority=self.priority_names.get(priority, str(priority)))
+
+    def _refill(self, direction: str, rate):
+        """
+        Начисляет байты за прошедшее время (не больше burst секунд передачи).
+        """
+        now = monotonic()
+        if rate:
+            self._tokens[direction] = min(rate * self.burst, self._tokens[direction]
+                                          + (now - self._updated[direction]) * rate)
+        self._updated[direction] = now
+
+    def throttle(self, chunks, direction: str, priority: int = BULK):
+        """
+        Пропускает блоки байт с ограничением скорости.
+
+        Args:
+            chunks (Iterable[bytes]): Блоки (тело ответа или загружаемого файла).
+            direction (str): 'down' или 'up'.
+            priority (int, optional): Класс приоритета. По умолчанию BULK.
+
+        Returns:
+            Iterator[bytes]: Те же блоки.
+        """
+        for chunk in chunks:
+            self.acquire(direction, len(chunk), priority)
+            yield chunk
+
+
+class ThrottledFile:
+    """
+    Файл, открытый на чтение, скорость чтения которого ограничена BandwidthShaper.
+
+    Длина известна заранее (__len__), поэтому requests отправляет его с Content-Length,
+    как обычный файл.
+    """
+
+    def __init__(self, fileobj, shaper: BandwidthShaper, direction: str = 'up',
+                 priority: int = BandwidthShaper.BULK):
+        """
+        Оборачивает файл.
+
+        Args:
+            fileobj: Файл, открытый на чтение в двоичном режиме.
+            shaper (BandwidthShaper): Ограничитель.
+            direction (str, optional): Направление. По умолчанию 'up'.
+            priority (int, optional): Класс приоритета. По умолчанию BULK.
+        """
+        self.fileobj = fileobj
+        self.shaper = shaper
+        self.direction = direction
+        self.priority = priority
+
+    def __len__(self):
+        """
+        Количество байт, оставшихся до конца файла.
+        """
+        return os.fstat(self.fileobj.fileno()).st_size - self.fileobj.tell()
+
+    def read(self, size: int = -1):
+        """
+        Читает блок файла, дождавшись разрешения BandwidthShaper.
+        """
+        chunk = self.fileobj.read(size)
+        if chunk:
+            self.shaper.acquire(self.direction, len(chunk), self.priority)
+        return chunk
+
+
+if __name__ == '__main__':
+    pass
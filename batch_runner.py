@@ -0,0 +1,332 @@
+"""
+Скрипт для пакетного резервного копирования фотографий многих профилей VK в Яндекс.Диск.
+
+Задания читаются из JSON-файла, вопросы через input() не задаются. Пользователи и списки
+альбомов всех профилей запрашиваются заранее одним users.get и пакетами execute на каждый
+токен VK. Одновременно выполняется не более concurrency заданий, остальные ждут в очереди
+в порядке файла.
+Каждое запущенное задание получает равную долю общего числа потоков (workers),
+поэтому большой профиль не вытесняет остальные. Ограничения частоты запросов
+к API VK и Яндекс.Диска общие для всех заданий с одним токеном.
+
+Формат файла заданий:
+    {
+        "token_yand": "токен Яндекс.Диска",
+        "token_vk": "токен VK",
+        "concurrency": 4,
+        "workers": 16,
+        "api_rate": 3,
+        "disk_rate": 10,
+        "by_url": false,
+        "dedup": "copy",
+        "size_policy": {"max_pixels": 2000000},
+        "archive": null,
+        "vk_url": null,
+        "disk_url": null,
+        "bandwidth": {"down": 4000000, "up": 2000000,
+                      "schedule": [{"start": "09:00", "end": "19:00", "down": 1000000,
+                                    "up": 500000}]},
+        "jobs": [
+            {"profile": "durov", "albums": {"-6": 10, "-7": 5}, "folder": "durov"},
+            {"profile": "id1", "albums": ["-6", "-15"], "count": 5}
+        ]
+    }
+У задания можно переопределить token_yand, token_vk, size_policy и archive. Если folder не указан,
+используется имя профиля, если albums не указан - альбом "-6" (фото профиля),
+если count не указан - 5 фотографий на альбом. vk_url и disk_url задают адреса API
+(например, локальных серверов standins). Лимиты bandwidth (байт в секунду) общие
+для всех заданий: фотографии недавно измененных альбомов передаются раньше остальных.
+
+Пример использования:
+    python batch_runner.py jobs.json --report batch_report.json --metrics metrics.json \
+        --prometheus backup.prom
+"""
+import argparse
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import monotonic
+
+from tqdm import tqdm
+
+from bandwidth import BandwidthShaper
+from backup_index import BackupIndex
+from http_session import SessionPool
+from main import Backup
+from vk_api import VkApi
+
+
+class BatchRunner:
+    """
+    Планировщик пакетного резервного копирования нескольких профилей.
+
+    Attributes:
+        jobs (list): Список заданий (словарей из файла заданий).
+        token_yand (str): Токен Яндекс.Диска по умолчанию.
+        token_vk (str): Токен VK по умолчанию.
+        concurrency (int): Сколько заданий выполняется одновременно.
+        workers (int): Общее число потоков передачи, делится между запущенными заданиями.
+        api_rate (float): Запросов к API VK в секунду на токен.
+        disk_rate (float): Запросов к API Яндекс.Диска в секунду на токен.
+        by_url (bool): Загружать фотографии на Яндекс.Диск по URL.
+        dedup (str or None): Режим дедупликации по SHA-256 ('skip', 'copy' или None).
+        size_policy (dict or None): Параметры SizePolicy для выбора размера фотографий.
+        archive (str or None): Загружать фотографии архивами 'tar' или 'zip'.
+        bandwidth (dict or None): Лимиты скорости и расписание из файла заданий.
+        shaper (BandwidthShaper): Общее для всех заданий ограничение скорости.
+        vk_url (str or None): Базовый URL методов API VK.
+        disk_url (str or None): Базовый URL REST API Яндекс.Диска.
+        http (SessionPool): Общий для всех заданий пул соединений.
+        index (BackupIndex or None): Общий для всех заданий индекс переданных фотографий.
+    """
+    default_album = '-6'
+    default_count = 5
+
+    def __init__(self, jobs: list, token_yand: str = None, token_vk: str = None,
+                 concurrency: int = 4, workers: int = 16, api_rate: float = 3,
+                 disk_rate: float = 10, by_url: bool = False,
+                 index_path: str = 'backup_index.sqlite3', dedup: str = None,
+                 size_policy: dict = None, archive: str = None, bandwidth: dict = None,
+                 vk_url: str = None, disk_url: str = None):
+        """
+        Инициализирует планировщик.
+
+        Args:
+            jobs (list): Задания.
+            token_yand (str, optional): Токен Яндекс.Диска по умолчанию.
+            token_vk (str, optional): Токен VK по умолчанию.
+            concurrency (int, optional): Одновременных заданий. По умолчанию 4.
+            workers (int, optional): Общее число потоков передачи. По умолчанию 16.
+            api_rate (float, optional): Запросов к API VK в секунду. По умолчанию 3.
+            disk_rate (float, optional): Запросов к API Яндекс.Диска в секунду. По умолчанию 10.
+            by_url (bool, optional): Загружать по URL. По умолчанию False.
+            index_path (str, optional): Файл индекса (None - без индекса).
+            dedup (str, optional): Режим дедупликации. По умолчанию None (выключена).
+            size_policy (dict, optional): Параметры SizePolicy. Задание может переопределить
+             их своим ключом size_policy.
+            archive (str, optional): Формат архивов ('tar' или 'zip'). По умолчанию None.
+            bandwidth (dict, optional): Лимиты скорости и расписание (см.
+             BandwidthShaper.configure). По умолчанию без ограничения.
+            vk_url (str, optional): Базовый URL методов API VK. По умолчанию api.vk.com.
+            disk_url (str, optional): Базовый URL REST API Яндекс.Диска. По умолчанию
+             cloud-api.yandex.net.
+        """
+        self.jobs = jobs
+        self.token_yand = token_yand
+        self.token_vk = token_vk
+        self.concurrency = concurrency
+        self.workers = workers
+        self.api_rate = api_rate
+        self.disk_rate = disk_rate
+        self.by_url = by_url
+        self.dedup = dedup
+        self.size_policy = size_policy
+        self.archive = archive
+        self.bandwidth = bandwidth
+        self.shaper = BandwidthShaper.from_config(bandwidth)
+        self.vk_url = vk_url
+        self.disk_url = disk_url
+        self.http = SessionPool(pool_maxsize=max(workers // concurrency, 1) * 2)
+        self.index = BackupIndex(index_path) if index_path else None
+        self._print_lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs):
+        """
+        Создает планировщик по JSON-файлу заданий.
+
+        Args:
+            path (str): Путь к файлу заданий.
+            **kwargs: Параметры, переопределяющие значения из файла.
+
+        Returns:
+            BatchRunner: Планировщик.
+        """
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        jobs = config.pop('jobs')
+        return cls(jobs, **{**config, **kwargs})
+
+    def run(self):
+        """
+        Выполняет все задания и возвращает их итоги в порядке файла заданий.
+
+        Returns:
+            list: Итог по каждому заданию (см. _run_job).
+        """
+        results = [None] * len(self.jobs)
+        start = monotonic()
+        profiles = self.resolve_profiles()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor, \
+                tqdm(total=len(self.jobs), desc='Задания', unit='профиль') as progress:
+            futures = {executor.submit(self._run_job, number, job, profiles[number]): number
+                       for number, job in enumerate(self.jobs)}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                progress.update()
+
+        self.http.report()
+        print(f"Все задания выполнены за {monotonic() - start:.1f} с.")
+        return results
+
+    def resolve_profiles(self):
+        """
+        Получает пользователей и альбомы профилей всех заданий (VkApi.profiles_info):
+        по одному набору запросов на каждый токен VK вместо двух запросов на задание.
+
+        Returns:
+            list: Для каждого задания - данные профиля для VkApi.use_profile или None,
+             если их получить не удалось (тогда задание запросит их само).
+        """
+        profiles = [None] * len(self.jobs)
+        by_token = {}
+        for number, job in enumerate(self.jobs):
+            token_vk = job.get('token_vk', self.token_vk)
+            if token_vk is not None:
+                by_token.setdefault(token_vk, []).append(number)
+
+        for token_vk, numbers in by_token.items():
+            names = list(dict.fromkeys(str(self.jobs[number]['profile']) for number in numbers))
+            try:
+                vk = VkApi(names[0], token_vk=token_vk, http=self.http, api_rate=self.api_rate,
+                           api_url=self.vk_url)
+                found = vk.profiles_info(names)
+            except (Exception, SystemExit) as e:
+                tqdm.write(f"Не удалось получить профили заранее: {str(e) or type(e).__name__}")
+                continue
+            for number in numbers:
+                profiles[number] = found.get(str(self.jobs[number]['profile']))
+        return profiles
+
+    def _run_job(self, number: int, job: dict, profile_info: dict = None):
+        """
+        Выполняет одно задание: копирует выбранные альбомы профиля.
+
+        Args:
+            number (int): Номер задания в файле.
+            job (dict): Задание.
+            profile_info (dict, optional): Пользователь и альбомы из resolve_profiles.
+             Если не переданы, запрашиваются users_info и getting_list_albums.
+
+        Returns:
+            dict: {'profile', 'folder', 'status' ('ok' или 'error'), 'uploaded', 'failed',
+             'seconds', 'error'}
+        """
+        profile = str(job['profile'])
+        result = {'profile': profile, 'folder': job.get('folder', profile), 'status': 'ok',
+                  'uploaded': 0, 'failed': 0, 'seconds': 0.0, 'error': None}
+        self._log(number, profile, 'начато')
+        start = monotonic()
+
+        try:
+            backup = self.make_backup(job)
+            if profile_info is not None:
+                backup.use_profile(profile_info)
+            else:
+                backup.users_info()
+                backup.getting_list_albums()
+            result.update(backup.backup_photos())
+        except (Exception, SystemExit) as e:
+            result['status'] = 'error'
+            result['error'] = str(e) or type(e).__name__
+
+        result['seconds'] = round(monotonic() - start, 1)
+        self._log(number, profile, f"{'готово' if result['status'] == 'ok' else 'ошибка'}: "
+                                   f"загружено {result['uploaded']}, "
+                                   f"ошибок {result['failed']}, {result['seconds']} с")
+        return result
+
+    def make_backup(self, job: dict):
+        """
+        Создает объект Backup для задания с общими для всех заданий пулом соединений,
+        индексом и долей потоков.
+
+        Args:
+            job (dict): Задание.
+
+        Returns:
+            Backup: Объект для копирования профиля задания.
+
+        Raises:
+            ValueError: Если для задания не указан токен VK.
+        """
+        profile = str(job['profile'])
+        token_vk = job.get('token_vk', self.token_vk)
+        if token_vk is None:
+            raise ValueError('Не указан token_vk')
+        share = max(self.workers // self.concurrency, 1)
+        return Backup(profile, token_yand=job.get('token_yand', self.token_yand),
+                      token_vk=token_vk,
+                      workers=share, per_host=share, upload_workers=share,
+                      href_ahead=share, api_rate=self.api_rate, disk_rate=self.disk_rate,
+                      index_path=None, index=self.index, by_url=self.by_url,
+                      albums=self._albums(job), name_folder=job.get('folder', profile),
+                      http=self.http, dedup=self.dedup,
+                      size_policy=job.get('size_policy', self.size_policy),
+                      archive=job.get('archive', self.archive), bandwidth=self.shaper,
+                      vk_url=self.vk_url, disk_url=self.disk_url)
+
+    def _albums(self, job: dict):
+        """
+        Приводит выбор альбомов задания к виду {ID альбома: количество фото}.
+
+        Args:
+            job (dict): Задание.
+
+        Returns:
+            dict: Выбор альбомов.
+        """
+        albums = job.get('albums', [self.default_album])
+        if isinstance(albums, dict):
+            return {str(id_album): int(count) for id_album, count in albums.items()}
+        count = int(job.get('count', self.default_count))
+        return {str(id_album): count for id_album in albums}
+
+    def _log(self, number: int, profile: str, message: str):
+        """
+        Выводит строку о ходе выполнения задания.
+        """
+        with self._print_lock:
+            tqdm.write(f"[{number + 1}/{len(self.jobs)}] {profile}: {message}")
+
+    @staticmethod
+    def report(results: list, path: str = None):
+        """
+        Печатает сводку по заданиям и при необходимости сохраняет ее в JSON-файл.
+
+        Args:
+            results (list): Итоги заданий из run().
+            path (str, optional): Путь к файлу отчета.
+        """
+        print(f"{'Профиль':<20} {'Статус':<7} {'Загружено':>9} {'Ошибок':>7} {'Время, с':>9}")
+        for result in results:
+            print(f"{result['profile']:<20} {result['status']:<7} {result['uploaded']:>9} "
+                  f"{result['failed']:>7} {result['seconds']:>9}")
+        print(f"Итого загружено {sum(result['uploaded'] for result in results)}, "
+              f"ошибок {sum(result['failed'] for result in results)}, "
+              f"неудачных заданий {sum(result['status'] != 'ok' for result in results)}")
+
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=4)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Пакетное резервное копирование профилей VK')
+    parser.add_argument('jobs', help='JSON-файл с заданиями')
+    parser.add_argument('--report', default='batch_report.json', help='Файл итогового отчета')
+    parser.add_argument('--metrics', help='Файл JSON-отчета с метриками')
+    parser.add_argument('--prometheus', help='Файл метрик для textfile-коллектора Prometheus')
+    parser.add_argument('--trace', help='Файл трассировки обработки фотографий')
+    args = parser.parse_args()
+
+    runner = BatchRunner.from_file(args.jobs)
+    runner.http.metrics.trace = bool(args.trace)
+    BatchRunner.report(runner.run(), args.report)
+    if args.metrics:
+        runner.http.metrics.write_json(args.metrics)
+    if args.prometheus:
+        runner.http.metrics.write_prometheus(args.prometheus)
+    if args.trace:
+        runner.http.metrics.write_trace(args.trace)
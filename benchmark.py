@@ -0,0 +1,186 @@
+"""
+Скрипт для измерения производительности резервного копирования на локальных серверах.
+
+Вместо API VK и Яндекс.Диска используются VkStandIn и DiskStandIn из модуля standins,
+поэтому результаты воспроизводимы и не требуют сети и токенов. Для каждого сочетания
+режима, размера альбома и количества потоков запускается отдельный процесс, в котором
+измеряются:
+    photos/s - фотографий в секунду;
+    MB/s     - мегабайт фотографий в секунду (по счетчикам байт Metrics);
+    peak RSS - пиковый объем памяти процесса (только на Unix).
+
+Режимы:
+    download - скачивание в папку 'photo' (upload_photo), потоков - workers;
+    upload   - загрузка из папки 'photo' на Яндекс.Диск (saving_photo_disk), потоков -
+               upload_workers; скачивание перед ним не измеряется;
+    stream   - потоковая передача без папки 'photo' (transfer_photos).
+Режимы download и upload используют папку 'photo' рядом с модулем, поэтому запускаются,
+только если она пуста, и очищают ее после себя.
+
+Пример использования:
+    python benchmark.py --albums 50 200 --workers 1 4 8 --latency 0.02 \
+        --bandwidth 5000000 --report benchmark.json
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from time import monotonic
+
+from standins import DiskStandIn, VkStandIn
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+MODES = ('download', 'upload', 'stream')
+PHOTO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'photo')
+
+
+def _counter(metrics, name: str):
+    """
+    Суммирует счетчик Metrics по всем меткам.
+    """
+    return sum(counter['value'] for counter in metrics.report()['counters']
+               if counter['name'] == name)
+
+
+def _run_scenario(scenario: dict):
+    """
+    Выполняет один сценарий в отдельном процессе и возвращает результаты измерений.
+
+    Args:
+        scenario (dict): {'mode', 'album_size', 'workers', 'vk_url', 'disk_url', 'folder'}.
+
+    Returns:
+        dict: Сценарий с добавленными 'photos', 'failed', 'seconds', 'photos_per_second',
+         'mb_per_second' и 'peak_rss_mb'.
+    """
+    from main import Backup
+
+    mode, workers = scenario['mode'], scenario['workers']
+    os.chdir(os.path.dirname(PHOTO_DIR))
+    backup = Backup('bench', token_yand='bench', token_vk='bench', staging=mode != 'stream',
+                    workers=workers, per_host=workers, upload_workers=workers,
+                    href_ahead=2 * workers, api_rate=1000, disk_rate=1000, index_path=None,
+                    albums={str(scenario['album_size']): scenario['album_size']},
+                    name_folder=scenario['folder'], vk_url=scenario['vk_url'],
+                    disk_url=scenario['disk_url'])
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), \
+            contextlib.redirect_stderr(devnull):
+        backup.users_info()
+        backup.getting_list_albums()
+        if mode == 'upload':
+            backup.creating_folder()
+            backup.upload_photo()
+        counter = 'bytes_in_total' if mode == 'download' else 'bytes_out_total'
+        bytes_before = _counter(backup.metrics, counter)
+        start = monotonic()
+        if mode == 'download':
+            backup.upload_photo()
+        elif mode == 'upload':
+            backup.saving_photo_disk()
+        else:
+            backup.transfer_photos()
+        seconds = monotonic() - start
+        payload = _counter(backup.metrics, counter) - bytes_before
+
+    if mode == 'download':
+        photos = len(os.listdir(PHOTO_DIR))
+        failed = scenario['album_size'] - photos
+    else:
+        photos, failed = backup.uploaded_count, backup.failed_count
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+    return {**scenario, 'photos': photos, 'failed': failed, 'seconds': round(seconds, 3),
+            'photos_per_second': round(photos / seconds, 2),
+            'mb_per_second': round(payload / 2 ** 20 / seconds, 2),
+            'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None}
+
+
+def run_benchmark(album_sizes: list, workers: list, modes: list = MODES,
+                  photo_size: int = 200 * 1024, **server_options):
+    """
+    Запускает локальные серверы и выполняет все сочетания режимов, размеров альбома
+    и количества потоков.
+
+    Args:
+        album_sizes (list): Размеры альбомов (количество фотографий).
+        workers (list): Количества потоков.
+        modes (list, optional): Режимы из MODES. По умолчанию все.
+        photo_size (int, optional): Размер фотографии в байтах. По умолчанию 200 КБ.
+        **server_options: latency, bandwidth, error_rate и rate_limit для обоих серверов.
+
+    Returns:
+        list: Результаты сценариев.
+    """
+    staging = [mode for mode in modes if mode != 'stream']
+    if staging and os.path.isdir(PHOTO_DIR) and os.listdir(PHOTO_DIR):
+        print(f"Папка '{PHOTO_DIR}' не пуста, режимы {', '.join(staging)} пропущены.")
+        modes = [mode for mode in modes if mode == 'stream']
+
+    albums = {str(size): size for size in album_sizes}
+    results = []
+    context = multiprocessing.get_context('spawn')
+    with VkStandIn(albums=albums, photo_size=photo_size, **server_options) as vk, \
+            DiskStandIn(**server_options) as disk:
+        for mode in modes:
+            for album_size in album_sizes:
+                for count in workers:
+                    scenario = {'mode': mode, 'album_size': album_size, 'workers': count,
+                                'vk_url': vk.api_url, 'disk_url': disk.api_url,
+                                'folder': f'bench_{mode}_{album_size}_{count}'}
+                    try:
+                        with ProcessPoolExecutor(1, mp_context=context) as pool:
+                            result = pool.submit(_run_scenario, scenario).result()
+                    finally:
+                        if mode != 'stream':
+                            shutil.rmtree(PHOTO_DIR, ignore_errors=True)
+                    del result['vk_url'], result['disk_url']
+                    results.append(result)
+                    print(_format_row(result))
+    return results
+
+
+def _format_row(result: dict):
+    """
+    Форматирует строку таблицы результатов.
+    """
+    rss = f"{result['peak_rss_mb']:.1f}" if result['peak_rss_mb'] is not None else '-'
+    return (f"{result['mode']:<9}{result['album_size']:>7}{result['workers']:>8}"
+            f"{result['photos']:>8}{result['failed']:>7}{result['seconds']:>9.2f}"
+            f"{result['photos_per_second']:>10.1f}{result['mb_per_second']:>9.2f}{rss:>10}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Измерение производительности на локальных '
+                                                 'серверах VK и Яндекс.Диска')
+    parser.add_argument('--albums', type=int, nargs='+', default=[50, 200],
+                        help='Размеры альбомов')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8],
+                        help='Количества потоков')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES),
+                        help='Режимы')
+    parser.add_argument('--photo-size', type=int, default=200 * 1024,
+                        help='Размер фотографии в байтах')
+    parser.add_argument('--latency', type=float, default=0.02, help='Задержка ответа, с')
+    parser.add_argument('--bandwidth', type=float, default=0,
+                        help='Скорость на соединение, байт/с (0 - без ограничения)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов HTTP 500')
+    parser.add_argument('--rate-limit', type=float, default=0,
+                        help='Запросов к API в секунду (0 - без ограничения)')
+    parser.add_argument('--report', help='Файл JSON-отчета')
+    args = parser.parse_args()
+
+    print(f"{'mode':<9}{'album':>7}{'workers':>8}{'photos':>8}{'failed':>7}{'seconds':>9}"
+          f"{'photos/s':>10}{'MB/s':>9}{'RSS, MB':>10}")
+    report = run_benchmark(args.albums, args.workers, args.modes, args.photo_size,
+                           latency=args.latency, bandwidth=args.bandwidth,
+                           error_rate=args.error_rate, rate_limit=args.rate_limit)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
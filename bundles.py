@@ -0,0 +1,105 @@
+"""
+Модуль bundles для упаковки фотографий в архивы tar или zip перед загрузкой.
+
+Каждая загрузка на Яндекс.Диск стоит двух запросов (ссылка и PUT), поэтому
+для тысяч маленьких фотографий время уходит в основном на задержки. PhotoBundle
+собирает фотографии в один архивный файл, который загружается одним PUT.
+Фотографии добавляются по мере скачивания, без сжатия (JPEG уже сжат),
+и их можно извлечь обычными программами для работы с архивами.
+
+Пример использования:
+    bundle = PhotoBundle('album_-6_1.tar', 'tar')
+    bundle.add('photo_1.jpg', fileobj, size, {'id': '1', 'sha256': '...'})
+    bundle.close()
+"""
+import os
+import tarfile
+import zipfile
+from time import time
+
+FORMATS = ('tar', 'zip')
+
+
+class PhotoBundle:
+    """
+    Архив с фотографиями, открытый на запись.
+
+    Attributes:
+        path (str): Путь к локальному файлу архива.
+        name (str): Имя файла архива.
+        fmt (str): Формат архива: 'tar' или 'zip'.
+        photos (list): Описания добавленных фотографий для манифеста.
+        uploaded (bool): Архив загружен на Яндекс.Диск.
+    """
+
+    def __init__(self, path: str, fmt: str = 'tar'):
+        """
+        Создает пустой архив.
+
+        Args:
+            path (str): Путь к файлу архива.
+            fmt (str, optional): 'tar' или 'zip'. По умолчанию 'tar'.
+
+        Raises:
+            ValueError: Если формат не поддерживается.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Неизвестный формат архива: {fmt}")
+        self.path = path
+        self.name = os.path.basename(path)
+        self.fmt = fmt
+        self.photos = []
+        self.uploaded = False
+        self._size = None
+        if fmt == 'tar':
+            self._archive = tarfile.open(path, 'w')
+        else:
+            self._archive = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED)
+
+    @property
+    def size(self):
+        """
+        Размер файла архива в байтах (после close() - окончательный).
+        """
+        return self._size if self._size is not None else os.path.getsize(self.path)
+
+    def add(self, name: str, fileobj, size: int, info: dict = None):
+        """
+        Добавляет фотографию в архив.
+
+        Args:
+            name (str): Имя файла внутри архива.
+            fileobj: Файловый объект, открытый на чтение с начала.
+            size (int): Размер фотографии в байтах.
+            info (dict, optional): Сведения о фотографии для манифеста.
+        """
+        if self.fmt == 'tar':
+            member = tarfile.TarInfo(name)
+            member.size = size
+            member.mtime = int(time())
+            self._archive.addfile(member, fileobj)
+        else:
+            with self._archive.open(name, 'w', force_zip64=True) as target:
+                for chunk in iter(lambda: fileobj.read(64 * 1024), b''):
+                    target.write(chunk)
+        self.photos.append({**(info or {}), 'file': name, 'size': size})
+
+    def close(self):
+        """
+        Дописывает служебные данные архива и закрывает файл.
+        """
+        self._archive.close()
+        self._size = os.path.getsize(self.path)
+
+    def manifest(self):
+        """
+        Возвращает описание архива для манифеста.
+
+        Returns:
+            dict: {'name', 'format', 'size', 'photos'}
+        """
+        return {'name': self.name, 'format': self.fmt, 'size': self.size, 'photos': self.photos}
+
+
+if __name__ == '__main__':
+    pass
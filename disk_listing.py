@@ -0,0 +1,131 @@
+"""
+Модуль disk_listing с кэшем содержимого папок на Яндекс.Диске.
+
+Содержимое папки запрашивается один раз постраничным запросом GET resources
+и хранится в памяти: для каждого файла - размер, MD5 и SHA-256. Это позволяет
+не загружать повторно файлы, которые уже лежат в папке, без отдельного
+запроса на каждый файл. Загруженные файлы добавляются в кэш сразу после загрузки.
+
+Если указан путь к файлу, кэш сохраняется на диск в формате JSON и используется
+при следующем запуске, пока не устарел (ttl секунд).
+
+Пример использования:
+    listing = DiskListing('disk_listing.json')
+    if not listing.fresh('image'):
+        listing.replace('image', {...})
+    entry = listing.get('image', 'photo_1.jpg')
+    listing.save()
+"""
+import json
+import os
+import threading
+from time import time
+
+
+class DiskListing:
+    """
+    Потокобезопасный кэш содержимого папок на Яндекс.Диске.
+
+    Attributes:
+        path (str or None): Файл кэша на диске (None - только в памяти).
+        ttl (float): Сколько секунд содержимое папки считается актуальным.
+    """
+
+    def __init__(self, path: str = None, ttl: float = 3600):
+        """
+        Создает кэш и загружает его из файла path, если файл есть.
+
+        Args:
+            path (str, optional): Файл кэша. По умолчанию None (только в памяти).
+            ttl (float, optional): Время актуальности содержимого папки. По умолчанию 3600 с.
+        """
+        self.path = path
+        self.ttl = ttl
+        self._folders = {}
+        self._lock = threading.Lock()
+        self._changed = False
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self._folders = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Не удалось прочитать кэш содержимого Яндекс.Диска '{path}': {e}")
+
+    def fresh(self, folder: str):
+        """
+        Проверяет, что содержимое папки есть в кэше и не устарело.
+
+        Args:
+            folder (str): Папка на Яндекс.Диске.
+
+        Returns:
+            bool: True, если папку не нужно запрашивать заново.
+        """
+        with self._lock:
+            cached = self._folders.get(folder)
+            return cached is not None and time() - cached['fetched_at'] < self.ttl
+
+    def replace(self, folder: str, items: dict):
+        """
+        Заменяет содержимое папки в кэше.
+
+        Args:
+            folder (str): Папка на Яндекс.Диске.
+            items (dict): {имя файла: {'size', 'md5', 'sha256'}}
+        """
+        with self._lock:
+            self._folders[folder] = {'fetched_at': time(), 'items': items}
+            self._changed = True
+
+    def get(self, folder: str, name: str):
+        """
+        Возвращает сведения о файле папки.
+
+        Args:
+            folder (str): Папка на Яндекс.Диске.
+            name (str): Имя файла.
+
+        Returns:
+            dict or None: {'size', 'md5', 'sha256'} или None, если файла нет в кэше.
+        """
+        with self._lock:
+            cached = self._folders.get(folder)
+            return cached['items'].get(name) if cached is not None else None
+
+    def put(self, folder: str, name: str, size: int, md5: str = None, sha256: str = None):
+        """
+        Добавляет в кэш загруженный файл. Если содержимое папки еще не запрашивалось,
+        ничего не делает, чтобы не выдать неполный список за актуальный.
+
+        Args:
+            folder (str): Папка на Яндекс.Диске.
+            name (str): Имя файла.
+            size (int): Размер в байтах.
+            md5 (str, optional): MD5 содержимого.
+            sha256 (str, optional): SHA-256 содержимого.
+        """
+        with self._lock:
+            cached = self._folders.get(folder)
+            if cached is not None:
+                cached['items'][name] = {'size': size, 'md5': md5, 'sha256': sha256}
+                self._changed = True
+
+    def save(self):
+        """
+        Сохраняет кэш в файл path (если он указан и кэш изменился).
+        """
+        if not self.path:
+            return
+        with self._lock:
+            if not self._changed:
+                return
+            temp_path = f'{self.path}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._folders, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            self._changed = False
+
+
+if __name__ == '__main__':
+    pass
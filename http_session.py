@@ -0,0 +1,179 @@
+"""
+Модуль http_session с общим пулом HTTP-соединений для VkApi и YandexDiskApi.
+
+Все запросы идут через один requests.Session, поэтому соединения с каждым хостом
+(api.vk.com, CDN VK, cloud-api.yandex.net, uploader-хосты Яндекс.Диска) остаются открытыми
+(keep-alive) и переиспользуются, а TCP+TLS рукопожатие выполняется один раз на соединение.
+Каждый запрос учитывается в метриках (задержка, байты, ошибки по кодам).
+
+Пример использования:
+    http = SessionPool(pool_maxsize=8, host_pool_sizes={'api.vk.com': 2})
+    http.get('https://api.vk.com/method/users.get', params={...})
+    http.report()
+"""
+import threading
+from time import monotonic
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import Metrics
+
+
+class SessionPool:
+    """
+    Пул keep-alive соединений с раздельными лимитами для каждого хоста.
+
+    Attributes:
+        pool_connections (int): Сколько хостов одновременно держать в пуле.
+        pool_maxsize (int): Максимум соединений с одним хостом по умолчанию.
+        host_pool_sizes (dict): Индивидуальные размеры пулов {хост: максимум соединений}.
+        metrics (Metrics): Сборщик метрик запросов.
+    """
+
+    def __init__(self, pool_connections: int = 32, pool_maxsize: int = 8,
+                 host_pool_sizes: dict = None, metrics: Metrics = None):
+        """
+        Создает сессию и подключает адаптеры с пулами соединений.
+
+        Args:
+            pool_connections (int, optional): Количество хостов в пуле. По умолчанию 32.
+            pool_maxsize (int, optional): Соединений на хост по умолчанию. По умолчанию 8.
+            host_pool_sizes (dict, optional): Размеры пулов для отдельных хостов.
+            metrics (Metrics, optional): Сборщик метрик. По умолчанию общий для процесса.
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.host_pool_sizes = host_pool_sizes or {}
+        self.metrics = metrics if metrics is not None else Metrics.shared()
+
+        self.session = requests.Session()
+        self._adapters = [self._mount('https://', pool_maxsize),
+                          self._mount('http://', pool_maxsize)]
+        for host, size in self.host_pool_sizes.items():
+            self._adapters.append(self._mount(f'https://{host}/', size))
+
+        self._closed_stats = {}
+        self._lock = threading.Lock()
+
+    def _mount(self, prefix: str, pool_maxsize: int):
+        """
+        Подключает к сессии адаптер для URL, начинающихся с prefix.
+
+        Args:
+            prefix (str): Префикс URL.
+            pool_maxsize (int): Максимум соединений с одним хостом.
+
+        Returns:
+            HTTPAdapter: Подключенный адаптер.
+        """
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=pool_maxsize, pool_block=True)
+        self.session.mount(prefix, adapter)
+        return adapter
+
+    def request(self, method: str, url: str, **kwargs):
+        """
+        Выполняет HTTP-запрос через общую сессию и учитывает его в метриках.
+
+        Отправленные байты берутся из Content-Length запроса, а для тела-итератора
+        (chunked) подсчитываются по мере отправки. Полученные байты - Content-Length
+        ответа или размер уже прочитанного тела.
+
+        Args:
+            method (str): HTTP-метод.
+            url (str): URL запроса.
+            **kwargs: Параметры requests.Session.request.
+
+        Returns:
+            requests.Response: Ответ сервера.
+        """
+        sent = None
+        if hasattr(kwargs.get('data'), '__next__'):
+            sent = [0]
+            kwargs['data'] = self._counting(kwargs['data'], sent)
+
+        start = monotonic()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            self.metrics.request(method, url, monotonic() - start, error=type(e).__name__,
+                                 bytes_out=sent[0] if sent else 0)
+            raise
+
+        bytes_out = sent[0] if sent else int(response.request.headers.get('Content-Length', 0))
+        bytes_in = int(response.headers.get('Content-Length', 0)) if kwargs.get('stream') \
+            else len(response.content)
+        self.metrics.request(method, url, response.elapsed.total_seconds(),
+                             response.status_code, bytes_in=bytes_in, bytes_out=bytes_out)
+        return response
+
+    @staticmethod
+    def _counting(chunks, sent: list):
+        """
+        Пропускает блоки тела запроса, подсчитывая отправленные байты в sent[0].
+        """
+        for chunk in chunks:
+            sent[0] += len(chunk)
+            yield chunk
+
+    def get(self, url: str, **kwargs):
+        """Выполняет GET-запрос через общую сессию."""
+        return self.request('GET', url, **kwargs)
+
+    def put(self, url: str, **kwargs):
+        """Выполняет PUT-запрос через общую сессию."""
+        return self.request('PUT', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        """Выполняет POST-запрос через общую сессию."""
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        """
+        Собирает счетчики переиспользования соединений по хостам.
+
+        Returns:
+            dict: {хост: {'requests': запросов, 'connections': открыто соединений,
+             'reused': запросов по уже открытому соединению}}
+        """
+        with self._lock:
+            stats = {host: dict(values) for host, values in self._closed_stats.items()}
+
+        for adapter in self._adapters:
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host = stats.setdefault(key.key_host, {'requests': 0, 'connections': 0})
+                host['requests'] += pool.num_requests
+                host['connections'] += pool.num_connections
+
+        for values in stats.values():
+            values['reused'] = max(values['requests'] - values['connections'], 0)
+        return stats
+
+    def report(self):
+        """
+        Печатает счетчики переиспользования соединений по хостам.
+        """
+        for host, values in sorted(self.stats().items()):
+            print(f"{host}: запросов {values['requests']}, "
+                  f"новых соединений {values['connections']}, "
+                  f"переиспользовано {values['reused']}")
+
+    def close(self):
+        """
+        Закрывает все соединения, сохраняя накопленные счетчики.
+        """
+        stats = self.stats()
+        with self._lock:
+            self._closed_stats = {host: {'requests': values['requests'],
+                                         'connections': values['connections']}
+                                  for host, values in stats.items()}
+        self.session.close()
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,221 @@
+"""
+Модуль job_queue с устойчивой к сбоям очередью задач передачи фотографий на SQLite.
+
+Каждая задача - одна фотография (ID владельца, ID фото, URL, папка и токен Яндекс.Диска)
+и параметры задания (options: адреса API, дедупликация, лимиты скорости).
+Рабочие процессы берут задачи в аренду (lease) на lease_seconds секунд, передают фото
+и подтверждают выполнение (ack) или возвращают задачу в очередь (nack). Если процесс
+упал, срок аренды истекает и задачу забирает другой процесс, поэтому работа не теряется.
+Долгие задачи продлевают аренду (renew). ack и nack применяются, только пока задача
+в аренде у того же процесса, поэтому запоздавший ответ не меняет чужую задачу.
+
+База открывается в режиме WAL, поэтому несколько процессов могут читать и писать
+одновременно; выдача задач выполняется в транзакции BEGIN IMMEDIATE.
+
+Пример использования:
+    queue = JobQueue('jobs.sqlite3')
+    queue.put_many([{'owner_id': 1, 'photo_id': 2, 'url': '...', 'folder': 'image',
+                     'token_yand': '...'}])
+    for task in queue.lease('worker-1', 10):
+        ...
+        queue.ack(task['id'], 'worker-1')
+"""
+import json
+import sqlite3
+from time import time
+
+
+class JobQueue:
+    """
+    Очередь задач в файле SQLite, общая для нескольких процессов.
+
+    Attributes:
+        path (str): Путь к файлу базы данных.
+        lease_seconds (float): Срок аренды задачи.
+        max_attempts (int): После стольких неудачных попыток задача считается проваленной.
+    """
+    PENDING = 'pending'
+    LEASED = 'leased'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, path: str = 'jobs.sqlite3', lease_seconds: float = 300,
+                 max_attempts: int = 5):
+        """
+        Открывает (или создает) очередь.
+
+        Args:
+            path (str, optional): Путь к файлу базы. По умолчанию 'jobs.sqlite3'.
+            lease_seconds (float, optional): Срок аренды задачи. По умолчанию 300 с.
+            max_attempts (int, optional): Максимум попыток на задачу. По умолчанию 5.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS tasks ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' owner_id TEXT NOT NULL,'
+            ' photo_id TEXT NOT NULL,'
+            ' url TEXT NOT NULL,'
+            ' folder TEXT NOT NULL,'
+            ' token_yand TEXT,'
+            ' state TEXT NOT NULL,'
+            ' attempts INTEGER NOT NULL DEFAULT 0,'
+            ' lease_until REAL,'
+            ' worker TEXT,'
+            ' error TEXT,'
+            ' updated_at REAL,'
+            ' options TEXT,'
+            ' UNIQUE (owner_id, photo_id, folder))')
+        columns = [row[1] for row in self._connection.execute('PRAGMA table_info(tasks)')]
+        if 'options' not in columns:
+            self._connection.execute('ALTER TABLE tasks ADD COLUMN options TEXT')
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, lease_until)')
+
+    def put_many(self, tasks):
+        """
+        Добавляет задачи в очередь. Уже существующие задачи (по владельцу, фото и папке)
+        не дублируются.
+
+        Args:
+            tasks (Iterable[dict]): Задачи с ключами owner_id, photo_id, url, folder, token_yand
+             и необязательным options (словарь параметров задания).
+
+        Returns:
+            int: Количество добавленных задач.
+        """
+        now = time()
+        rows = [(str(task['owner_id']), str(task['photo_id']), task['url'], task['folder'],
+                 task.get('token_yand'), json.dumps(task.get('options') or {}), self.PENDING,
+                 now) for task in tasks]
+        self._connection.execute('BEGIN IMMEDIATE')
+        try:
+            before = self._connection.total_changes
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO tasks (owner_id, photo_id, url, folder, token_yand,'
+                ' options, state, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            added = self._connection.total_changes - before
+            self._connection.execute('COMMIT')
+        except sqlite3.Error:
+            self._connection.execute('ROLLBACK')
+            raise
+        return added
+
+    def lease(self, worker: str, limit: int):
+        """
+        Берет в аренду до limit свободных задач, включая задачи с истекшей арендой.
+
+        Args:
+            worker (str): Имя рабочего процесса.
+            limit (int): Максимум задач.
+
+        Returns:
+            list: Задачи (sqlite3.Row) с ключами id, owner_id, photo_id, url, folder,
+             token_yand, options (JSON) и attempts (сколько раз задачу брали до этой аренды).
+        """
+        now = time()
+        self._connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._connection.execute(
+                'UPDATE tasks SET state = ?, updated_at = ?'
+                ' WHERE state = ? AND lease_until < ? AND attempts >= ?',
+                (self.FAILED, now, self.LEASED, now, self.max_attempts))
+            rows = self._connection.execute(
+                'SELECT * FROM tasks WHERE state = ? OR (state = ? AND lease_until < ?)'
+                ' ORDER BY id LIMIT ?',
+                (self.PENDING, self.LEASED, now, limit)).fetchall()
+            self._connection.executemany(
+                'UPDATE tasks SET state = ?, lease_until = ?, worker = ?,'
+                ' attempts = attempts + 1, updated_at = ? WHERE id = ?',
+                [(self.LEASED, now + self.lease_seconds, worker, now, row['id'])
+                 for row in rows])
+            self._connection.execute('COMMIT')
+        except sqlite3.Error:
+            self._connection.execute('ROLLBACK')
+            raise
+        return rows
+
+    def renew(self, task_ids: list, worker: str):
+        """
+        Продлевает аренду задач, которые еще выполняются, на lease_seconds секунд.
+
+        Args:
+            task_ids (list): ID задач.
+            worker (str): Имя рабочего процесса, взявшего задачи.
+
+        Returns:
+            int: Количество задач, аренда которых продлена.
+        """
+        now = time()
+        before = self._connection.total_changes
+        self._connection.executemany(
+            'UPDATE tasks SET lease_until = ?, updated_at = ?'
+            ' WHERE id = ? AND worker = ? AND state = ?',
+            [(now + self.lease_seconds, now, task_id, worker, self.LEASED)
+             for task_id in task_ids])
+        return self._connection.total_changes - before
+
+    def ack(self, task_id: int, worker: str):
+        """
+        Подтверждает выполнение задачи.
+
+        Args:
+            task_id (int): ID задачи.
+            worker (str): Имя рабочего процесса, взявшего задачу.
+
+        Returns:
+            bool: False, если задача уже не в аренде у worker (аренда истекла
+             и задачу взял другой процесс).
+        """
+        cursor = self._connection.execute(
+            'UPDATE tasks SET state = ?, lease_until = NULL, error = NULL, updated_at = ?'
+            ' WHERE id = ? AND worker = ? AND state = ?',
+            (self.DONE, time(), task_id, worker, self.LEASED))
+        return cursor.rowcount > 0
+
+    def nack(self, task_id: int, worker: str, error: str = None):
+        """
+        Возвращает задачу в очередь после неудачной попытки. После max_attempts
+        попыток задача помечается как проваленная.
+
+        Args:
+            task_id (int): ID задачи.
+            worker (str): Имя рабочего процесса, взявшего задачу.
+            error (str, optional): Описание ошибки.
+
+        Returns:
+            bool: False, если задача уже не в аренде у worker.
+        """
+        cursor = self._connection.execute(
+            'UPDATE tasks SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END,'
+            ' lease_until = NULL, error = ?, updated_at = ?'
+            ' WHERE id = ? AND worker = ? AND state = ?',
+            (self.max_attempts, self.FAILED, self.PENDING, error, time(), task_id, worker,
+             self.LEASED))
+        return cursor.rowcount > 0
+
+    def counts(self):
+        """
+        Считает задачи по состояниям.
+
+        Returns:
+            dict: {состояние: количество}
+        """
+        rows = self._connection.execute(
+            'SELECT state, COUNT(*) FROM tasks GROUP BY state').fetchall()
+        return {state: count for state, count in rows}
+
+    def close(self):
+        """
+        Закрывает соединение с базой данных.
+        """
+        self._connection.close()
+
+
+if __name__ == '__main__':
+    pass
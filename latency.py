@@ -0,0 +1,142 @@
+"""
+Модуль latency для адаптивных таймаутов по наблюдаемым задержкам.
+
+LatencyTracker хранит последние задержки ответов (время до получения заголовков,
+response.elapsed) отдельно для каждого ключа - хоста CDN или метода API - и по их
+перцентилям вычисляет таймауты соединения и чтения для requests:
+    connect = factor * p50, read = factor * p95 (в пределах min_timeout..max_timeout).
+Пока замеров меньше min_samples, используются таймауты по умолчанию. Таймаут чтения
+в requests ограничивает паузу между блоками, а не все скачивание, поэтому большие
+фотографии на медленном канале не обрываются, пока данные идут.
+
+Перцентиль p95 также служит порогом для дублирующих (hedged) запросов: если ответа
+нет дольше p95, можно отправить тот же запрос повторно и взять первый ответ.
+
+Пример использования:
+    latency = LatencyTracker.shared()
+    response = http.get(url, timeout=latency.timeout(host))
+    latency.record(host, response.elapsed.total_seconds())
+"""
+import threading
+from collections import deque
+
+
+class LatencyTracker:
+    """
+    Потокобезопасная статистика задержек по ключам.
+
+    Attributes:
+        window (int): Сколько последних замеров хранить для ключа.
+        min_samples (int): Сколько замеров нужно, чтобы перейти к адаптивным таймаутам.
+        factor (float): Во сколько раз таймаут больше перцентиля.
+        default_timeout (tuple): Таймауты (соединение, чтение) до накопления замеров.
+        min_timeout (tuple): Нижние границы таймаутов.
+        max_timeout (tuple): Верхние границы таймаутов.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, window: int = 200, min_samples: int = 10, factor: float = 3.0,
+                 default_timeout: tuple = (3.05, 10.0), min_timeout: tuple = (0.5, 2.0),
+                 max_timeout: tuple = (10.0, 60.0)):
+        """
+        Создает пустую статистику.
+
+        Args:
+            window (int, optional): Размер окна замеров. По умолчанию 200.
+            min_samples (int, optional): Минимум замеров. По умолчанию 10.
+            factor (float, optional): Множитель перцентиля. По умолчанию 3.
+            default_timeout (tuple, optional): Таймауты без статистики. По умолчанию (3.05, 10).
+            min_timeout (tuple, optional): Нижние границы. По умолчанию (0.5, 2).
+            max_timeout (tuple, optional): Верхние границы. По умолчанию (10, 60).
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self.factor = factor
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        """
+        Возвращает общую для процесса статистику, создавая ее при первом вызове.
+
+        Returns:
+            LatencyTracker: Статистика задержек.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def record(self, key: str, seconds: float):
+        """
+        Добавляет замер задержки.
+
+        Args:
+            key (str): Хост или метод API.
+            seconds (float): Время до получения заголовков ответа.
+        """
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, key: str, q: float):
+        """
+        Вычисляет перцентиль задержки.
+
+        Args:
+            key (str): Хост или метод API.
+            q (float): Перцентиль от 0 до 100.
+
+        Returns:
+            float or None: Задержка в секундах или None, если замеров меньше min_samples.
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+    def timeout(self, key: str):
+        """
+        Вычисляет таймауты для очередного запроса.
+
+        Args:
+            key (str): Хост или метод API.
+
+        Returns:
+            tuple: (таймаут соединения, таймаут чтения) в секундах.
+        """
+        p50 = self.percentile(key, 50)
+        p95 = self.percentile(key, 95)
+        if p50 is None:
+            return self.default_timeout
+        return (self._clamp(self.factor * p50, 0), self._clamp(self.factor * p95, 1))
+
+    def hedge_delay(self, key: str):
+        """
+        Возвращает задержку, после которой стоит отправить дублирующий запрос.
+
+        Args:
+            key (str): Хост или метод API.
+
+        Returns:
+            float or None: p95 задержки или None, если замеров недостаточно.
+        """
+        return self.percentile(key, 95)
+
+    def _clamp(self, value: float, position: int):
+        """
+        Ограничивает таймаут границами min_timeout и max_timeout.
+        """
+        return min(max(value, self.min_timeout[position]), self.max_timeout[position])
+
+
+if __name__ == '__main__':
+    pass
@@ -4,17 +4,37 @@
 Этот скрипт использует API VK и API Яндекс.Диска для получения информации о пользователях VK,
 их альбомах, загрузки фотографий на Яндекс.Диск и создания резервной копии фотографий.
 
+По умолчанию фотографии передаются потоком: тело ответа VK сразу отправляется
+на Яндекс.Диск без сохранения в локальную папку 'photo'. Промежуточное сохранение
+на диск включается параметром staging=True, а упаковка фотографий каждого альбома
+в архивы tar или zip - параметром archive.
+
 Пример использования:
     backup = Backup(name_profiles, token_yand='ваш токен от Yandex.Disk',
      token_vk='ваш токен от VK')
     backup.users_info()
     backup.getting_list_albums()
-    backup.upload_photo()
-    backup.creating_folder()
-    backup.saving_photo_disk()
+    backup.backup_photos()
 
 """
 
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from functools import partial
+from itertools import groupby, islice
+from operator import itemgetter
+from tempfile import SpooledTemporaryFile, TemporaryDirectory
+from time import sleep, strftime, time
+
+from tqdm import tqdm
+
+from backup_index import BackupIndex
+from bundles import PhotoBundle
+from http_session import SessionPool
+from rate_limiter import backoff_delay
+from size_policy import SizePolicy
 from vk_api import VkApi
 from yandex_disk_api import YandexDiskApi
 
@@ -28,18 +48,599 @@ class Backup(VkApi, YandexDiskApi):
         token_yand (str): Токен OAuth для доступа к API Яндекс.Диска.
         token_vk (str, optional): Токен доступа к API VK. Если не указан,
         требуются права на доступ к фотографиям и альбомам.
+        staging (bool): Сохранять фотографии в папку 'photo' перед загрузкой на Яндекс.Диск.
+        chunk_size (int): Размер блока (в байтах) при потоковой передаче фотографий.
+        workers (int): Количество потоков скачивания фотографий из VK.
+        per_host (int): Максимум одновременных соединений с одним хостом CDN VK.
+        upload_workers (int): Количество одновременных загрузок на Яндекс.Диск.
+        href_ahead (int): Сколько ссылок для загрузки на Яндекс.Диск запрашивать заранее
+         (при загрузке из папки 'photo'; при потоковой передаче ссылка запрашивается
+         каждым потоком непосредственно перед загрузкой).
+        pool_sizes (dict): Размеры пулов keep-alive соединений для отдельных хостов
+         (если не передан готовый http).
+        api_rate (float): Запросов к API VK в секунду на токен.
+        disk_rate (float): Запросов к API Яндекс.Диска в секунду на токен.
+        index_path (str or None): Файл индекса уже переданных фотографий (None - без индекса).
+        index (BackupIndex or None): Уже открытый индекс (вместо index_path), например
+         общий для нескольких объектов Backup.
+        by_url (bool): Загружать фотографии на Яндекс.Диск по URL, без передачи через этот хост.
+        max_operations (int): Максимум одновременных операций загрузки по URL.
+        albums (dict or None): Выбор {ID альбома: количество фото} без вопросов пользователю.
+        name_folder (str or None): Папка на Яндекс.Диске без вопроса пользователю.
+        http (SessionPool): Общий пул соединений для VK и Яндекс.Диска.
+        dedup (str or None): Не загружать повторно фотографии с уже загруженным содержимым
+         (по SHA-256): 'skip' - ссылаться на загруженный файл, 'copy' - копировать его
+         на Яндекс.Диске, None - загружать все фотографии.
+        listing_cache (str or None): Файл кэша содержимого папок Яндекс.Диска между запусками.
+        size_policy (SizePolicy or dict or None): Правила выбора размера фотографий
+         (по умолчанию - самая большая копия).
+        archive (str or None): Упаковывать фотографии альбома в архивы 'tar' или 'zip'.
+        bundle_size (int): Максимальный размер одного архива в байтах.
+        manifest_failed_count (int): Сколько манифестов архивов не удалось загрузить.
+        hedge (bool): Дублировать запросы фотографий, ответ на которые задерживается
+         дольше p95 задержки хоста CDN.
+        metrics_report (str or None): Файл JSON-отчета с метриками запуска.
+        prometheus_file (str or None): Файл метрик для textfile-коллектора Prometheus.
+        trace_file (str or None): Файл трассировки обработки фотографий (Chrome Trace Event).
+        vk_url (str or None): Базовый URL методов API VK вместо api.vk.com.
+        disk_url (str or None): Базовый URL REST API Яндекс.Диска вместо cloud-api.yandex.net.
+        bandwidth (dict or BandwidthShaper or None): Лимиты скорости скачивания и загрузки
+         {'down', 'up', 'schedule', 'recent_days'}, общие для всех объектов в процессе.
+        verify (bool): Сверять загруженные фотографии с контрольными суммами Яндекс.Диска
+         и загружать несовпавшие повторно.
     """
+    spool_size = 4 * 1024 * 1024
+    # Минимальная ожидаемая скорость отправки архива (байт/с): по ней таймаут ответа
+    # на PUT архива растет с его размером.
+    bundle_rate = 256 * 1024
+
+    def __init__(self, name_profile: str, token_yand, token_vk: str = None,
+                 staging: bool = False, chunk_size: int = 64 * 1024,
+                 workers: int = 8, per_host: int = 4,
+                 upload_workers: int = 4, href_ahead: int = 8, pool_sizes: dict = None,
+                 api_rate: float = 3, disk_rate: float = 10,
+                 index_path: str = 'backup_index.sqlite3',
+                 by_url: bool = False, max_operations: int = 16,
+                 albums: dict = None, name_folder: str = None, http: SessionPool = None,
+                 index: BackupIndex = None, dedup: str = None, listing_cache: str = None,
+                 size_policy: SizePolicy = None, archive: str = None,
+                 bundle_size: int = 256 * 1024 * 1024, hedge: bool = False,
+                 metrics_report: str = None, prometheus_file: str = None,
+                 trace_file: str = None, vk_url: str = None, disk_url: str = None,
+                 bandwidth: dict = None, verify: bool = True):
+
+        if http is None:
+            http = SessionPool(pool_maxsize=max(per_host, upload_workers, href_ahead),
+                               host_pool_sizes=pool_sizes)
+        if index is None and index_path:
+            index = BackupIndex(index_path)
+        VkApi.__init__(self, name_profile, token_vk, workers=workers, per_host=per_host,
+                       http=http, api_rate=api_rate, index=index, chunk_size=chunk_size,
+                       albums=albums, size_policy=size_policy, hedge=hedge, api_url=vk_url,
+                       bandwidth=bandwidth)
+        YandexDiskApi.__init__(self, token_yand, upload_workers=upload_workers,
+                               href_ahead=href_ahead, http=http, disk_rate=disk_rate,
+                               index=index, max_operations=max_operations,
+                               name_folder=name_folder, dedup=dedup,
+                               listing_cache=listing_cache, disk_url=disk_url,
+                               bandwidth=bandwidth, verify=verify)
+        self.staging = staging
+        self.by_url = by_url
+        self.archive = archive
+        self.bundle_size = bundle_size
+        self.manifest_failed_count = 0
+        self.metrics_report = metrics_report
+        self.prometheus_file = prometheus_file
+        self.trace_file = trace_file
+        self._sources = {}
+        if trace_file:
+            self.metrics.trace = True
+
+    def backup_photos(self):
+        """
+        Копирует выбранные фотографии на Яндекс.Диск.
+
+        При staging=True выполняет прежнюю последовательность: создание папки, скачивание
+        в папку 'photo' и загрузку файлов (папка нужна заранее - по ней ведется индекс).
+        При by_url=True фотографии скачивает сам Яндекс.Диск, при archive - фотографии
+        загружаются архивами. Иначе используется потоковая передача.
+        Полностью скопированные альбомы запоминаются в индексе, чтобы при следующем
+        запуске пропустить их, если они не изменились. В конце печатает статистику
+        переиспользования соединений и сохраняет метрики в заданные файлы.
+
+        Returns:
+            dict: Итог копирования {'uploaded': загружено, 'failed': не удалось загрузить,
+             'deduplicated': не загружено повторно как дубликаты,
+             'existing': уже были в папке на Яндекс.Диске}.
+        """
+        if self.staging:
+            self.creating_folder()
+            with self.metrics.stage('download'):
+                self.upload_photo()
+            with self.metrics.stage('upload'):
+                self.saving_photo_disk()
+        elif self.by_url:
+            with self.metrics.stage('transfer_by_url'):
+                self.transfer_by_url()
+        elif self.archive:
+            with self.metrics.stage('archive'):
+                self.transfer_archives()
+        else:
+            with self.metrics.stage('transfer'):
+                self.transfer_photos()
+        self._remember_albums()
+        self.listing.save()
+        self.http.report()
+        if self.dedup_count:
+            print(f"Дубликатов не загружено повторно: {self.dedup_count}")
+        if self.hedged_count:
+            print(f"Продублировано медленных запросов фотографий: {self.hedged_count}")
+        if self.mismatch_count:
+            print(f"Не совпало с Яндекс.Диском при проверке: {self.mismatch_count}")
+        if self.manifest_failed_count:
+            print(f"Не удалось загрузить манифестов архивов: {self.manifest_failed_count}")
+        self.export_metrics()
+        return {'uploaded': self.uploaded_count, 'failed': self.failed_count,
+                'deduplicated': self.dedup_count, 'existing': self.existing_count}
+
+    def export_metrics(self):
+        """
+        Сохраняет накопленные метрики в файлы metrics_report, prometheus_file
+        и trace_file (те, что заданы).
+        """
+        if self.metrics_report:
+            self.metrics.write_json(self.metrics_report)
+        if self.prometheus_file:
+            self.metrics.write_prometheus(self.prometheus_file)
+        if self.trace_file:
+            self.metrics.write_trace(self.trace_file)
+
+    def transfer_photos(self):
+        """
+        Передает фотографии из VK на Яндекс.Диск потоком, без локальной папки 'photo'.
+
+        Каждое фото читается из ответа VK блоками по chunk_size байт и сразу отправляется
+        по ссылке загрузки Яндекс.Диска, поэтому в памяти находится не более одного блока
+        на поток. Одновременно передается не больше min(workers, upload_workers) фотографий
+        и не больше per_host с одного хоста VK; фотографии берутся из итератора по мере
+        освобождения потоков.
+        Загруженные фотографии отмечаются в индексе после проверки контрольных сумм
+        (_verify_uploads) и при следующем запуске пропускаются.
+        """
+        number_photos = self._selecting_photos()
+        url_photos = self._url_photos(number_photos)
+        self.creating_folder()
+        self._remote_listing()
+        streams = max(1, min(self.workers, self.upload_workers))
+
+        def transfer(id_photo, url):
+            with self._host_limit(url), self.metrics.span('photo', photo_id=id_photo):
+                return self._stream_photo(id_photo, url)
+
+        pending = set()
+        with ThreadPoolExecutor(max_workers=streams) as executor, \
+                tqdm(total=sum(number_photos.values()), desc='Передача фотографий',
+                     unit='фото') as progress:
+            for id_photo, url in url_photos:
+                if len(pending) >= 2 * streams:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        progress.update()
+                        future.result()
+                pending.add(executor.submit(transfer, id_photo, url))
+                self.metrics.gauge('queue_depth', len(pending), queue='stream')
+            for future in as_completed(pending):
+                progress.update()
+                future.result()
+        self._verify_uploads(self._reupload_photo)
+        self._sources.clear()
+
+    def transfer_by_url(self):
+        """
+        Загружает фотографии на Яндекс.Диск по URL из VK: файлы скачивает сам Яндекс.Диск,
+        поэтому трафик этого хоста не расходуется.
+
+        Фотографии, которые Яндекс.Диск не смог скачать, передаются потоком через этот хост
+        и, как в transfer_photos, отмечаются в индексе после проверки контрольных сумм.
+
+        Фотографии, для которых в папке уже есть файл с тем же именем, по URL не загружаются:
+        они скачиваются этим хостом и сверяются с файлом по контрольным суммам, совпавшие
+        пропускаются, остальные перезаписываются.
+        """
+        number_photos = self._selecting_photos()
+        url_photos = self._url_photos(number_photos)
+        self.creating_folder()
+        self._remote_listing()
+
+        present, fallback = [], []
+        with tqdm(total=sum(number_photos.values()), desc='Загрузка по URL',
+                  unit='фото') as progress:
+
+            def absent(pairs):
+                for id_photo, url in pairs:
+                    if self.listing.get(self.name_folder, f'photo_{id_photo}.jpg') is None:
+                        yield id_photo, url
+                    else:
+                        progress.update()
+                        present.append((id_photo, url))
+
+            for id_photo, url, uploaded in self.remote_upload(absent(url_photos)):
+                progress.update()
+                if uploaded:
+                    tqdm.write(f"Фото с ID {id_photo} загружено на Яндекс.Диск по URL.")
+                    self._mark_uploaded(id_photo)
+                else:
+                    fallback.append((id_photo, url))
+
+        if present:
+            print(f"В папке '{self.name_folder}' уже есть {len(present)} фото с такими же "
+                  f"именами, они будут сверены по контрольным суммам.")
+        if fallback:
+            print(f"Яндекс.Диск не смог скачать {len(fallback)} фото, "
+                  f"они будут переданы через этот хост.")
+        if present or fallback:
+            for id_photo, url in tqdm(present + fallback, desc='Передача фотографий',
+                                      unit='фото'):
+                with self.metrics.span('photo', photo_id=id_photo):
+                    self._stream_photo(id_photo, url,
+                                       self._remote_file(f'photo_{id_photo}.jpg'))
+            self._verify_uploads(self._reupload_photo)
+            self._sources.clear()
+
+    def transfer_archives(self):
+        """
+        Загружает фотографии каждого альбома архивами (archive: 'tar' или 'zip') не больше
+        bundle_size байт и манифестом album_<ID>_<запуск>_manifest.json со списком
+        фотографий каждого архива. Имена архивов и манифеста содержат время запуска,
+        поэтому повторный запуск не конфликтует с файлами предыдущего.
+
+        Вместо двух запросов к Яндекс.Диску на фотографию выполняется два запроса на архив.
+        Фотографии скачиваются в workers потоков и дописываются в архив во временной папке;
+        пока собирается следующий архив, предыдущий загружается.
+        """
+        number_photos = self._selecting_photos()
+        self.creating_folder()
+        run = strftime('%Y%m%d-%H%M%S')
+
+        with TemporaryDirectory() as folder, \
+                ThreadPoolExecutor(max_workers=self.workers) as downloads, \
+                ThreadPoolExecutor(max_workers=1) as uploads, \
+                tqdm(total=sum(number_photos.values()), desc='Упаковка фотографий',
+                     unit='фото') as progress:
+            uploading, manifests = None, []
+            for id_album, album_photos in groupby(self._album_photos(number_photos),
+                                                  key=itemgetter(0)):
+                url_photos = ((id_photo, url) for _, id_photo, url in album_photos)
+                bundles, bundle = [], None
+                while True:
+                    batch = list(islice(url_photos, self.workers))
+                    if not batch:
+                        break
+                    futures = [downloads.submit(self._fetch_photo, id_photo, url)
+                               for id_photo, url in batch]
+                    for (id_photo, url), future in zip(batch, futures):
+                        progress.update()
+                        fetched = future.result()
+                        if fetched is None:
+                            tqdm.write(f"Не удалось скачать фотографию с ID {id_photo}.")
+                            with self._count_lock:
+                                self.failed_count += 1
+                            continue
+                        spool, size, sha256 = fetched
+                        if bundle is not None and bundle.size + size > self.bundle_size:
+                            uploading = self._finish_bundle(bundle, uploads, uploading)
+                            bundle = None
+                        if bundle is None:
+                            bundle = PhotoBundle(os.path.join(
+                                folder, f'album_{id_album}_{run}_{len(bundles) + 1}.'
+                                        f'{self.archive}'),
+                                self.archive)
+                            bundles.append(bundle)
+                        with spool:
+                            bundle.add(f'photo_{id_photo}.jpg', spool, size,
+                                       {'id': id_photo, 'url': url, 'sha256': sha256})
+
+                if bundle is not None:
+                    uploading = self._finish_bundle(bundle, uploads, uploading)
+                    manifests.append(uploads.submit(self._upload_manifest, id_album, run,
+                                                    bundles))
+            self.manifest_failed_count += sum(not future.result() for future in manifests)
+
+    def _finish_bundle(self, bundle: PhotoBundle, uploads, uploading):
+        """
+        Закрывает архив и ставит его в очередь загрузки, дождавшись загрузки предыдущего,
+        чтобы во временной папке было не больше двух архивов.
+
+        :param bundle: Заполненный архив.
+        :param uploads: Пул потоков загрузки.
+        :param uploading: Future загрузки предыдущего архива или None.
+        :return: Future загрузки этого архива.
+        """
+        bundle.close()
+        if uploading is not None:
+            uploading.result()
+        return uploads.submit(self._upload_bundle, bundle)
+
+    def _upload_bundle(self, bundle: PhotoBundle):
+        """
+        Загружает архив на Яндекс.Диск, отмечает его фотографии в индексе и удаляет
+        локальный файл.
+
+        Неудачная загрузка повторяется (_upload_retrying), таймаут ответа растет
+        с размером архива (bundle_rate).
+
+        :param bundle: Закрытый архив.
+        :return: True, если архив загружен.
+        """
+        timeout = (5, 5 + os.path.getsize(bundle.path) / self.bundle_rate)
+        with open(bundle.path, 'rb') as f:
+
+            def chunks():
+                f.seek(0)
+                return iter(lambda: f.read(self.chunk_size), b'')
+
+            bundle.uploaded = self._upload_retrying(bundle.name, chunks, timeout)
+        os.remove(bundle.path)
+
+        if not bundle.uploaded:
+            with self._count_lock:
+                self.failed_count += len(bundle.photos)
+            return False
+        for photo in bundle.photos:
+            self._mark_uploaded(photo['id'],
+                                f"{self.name_folder}/{bundle.name}#{photo['file']}",
+                                photo['sha256'])
+        return True
+
+    def _upload_manifest(self, id_album: str, run: str, bundles: list):
+        """
+        Загружает манифест альбома: какие фотографии лежат в каком архиве.
+
+        :param id_album: ID альбома.
+        :param run: Время запуска в именах архивов.
+        :param bundles: Архивы альбома (уже загруженные или с ошибкой загрузки).
+        :return: True, если манифест загружен.
+        """
+        manifest = {'owner_id': self.users_id, 'album_id': id_album, 'created': int(time()),
+                    'bundles': [{**bundle.manifest(), 'uploaded': bundle.uploaded}
+                                for bundle in bundles]}
+        payload = json.dumps(manifest, ensure_ascii=False, indent=4).encode('utf-8')
+        return self._upload_retrying(f'album_{id_album}_{run}_manifest.json',
+                                     lambda: iter([payload]))
+
+    def _upload_retrying(self, name: str, chunks, timeout=5):
+        """
+        Загружает файл через _upload_stream, повторяя неудачную загрузку не более
+        upload_retries раз с паузой backoff_delay. Повторная попытка перезаписывает
+        файл, если предыдущая все-таки успела его создать.
+
+        :param name: Имя файла на Яндекс.Диске.
+        :param chunks: Функция без аргументов, возвращающая итератор блоков содержимого
+         с начала файла.
+        :param timeout: Таймаут запроса PUT.
+        :return: True, если файл загружен.
+        """
+        try:
+            for attempt in range(self.upload_retries + 1):
+                if attempt:
+                    self.metrics.inc('retries_total', stage='upload', reason='failed')
+                    sleep(backoff_delay(attempt - 1))
+                    self._overwrite.add(name)
+                if self._upload_stream(name, chunks(), timeout):
+                    return True
+            return False
+        finally:
+            self._overwrite.discard(name)
+
+    def _fetch_photo(self, id_photo: str, url: str):
+        """
+        Скачивает фотографию во временный файл (в памяти до spool_size байт),
+        вычисляя SHA-256 по мере получения блоков.
+
+        :param id_photo: ID фотографии.
+        :param url: URL для скачивания.
+        :return: (временный файл, размер, SHA-256) или None, если скачать не удалось.
+        """
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.metrics.inc('retries_total', stage='fetch', reason='failed')
+                sleep(backoff_delay(attempt - 1))
+            response = self._request_api(url_photo=url, stream=True)
+            if response is None:
+                continue
+
+            spool = SpooledTemporaryFile(max_size=self.spool_size)
+            digest = hashlib.sha256()
+            try:
+                with response:
+                    for chunk in self.shaper.throttle(
+                            response.iter_content(chunk_size=self.chunk_size), 'down',
+                            self._priority(id_photo)):
+                        spool.write(chunk)
+                        digest.update(chunk)
+            except OSError as e:
+                tqdm.write(f"Ошибка при скачивании фото с ID {id_photo}: {e}")
+                spool.close()
+                continue
+            size = spool.tell()
+            spool.seek(0)
+            return spool, size, digest.hexdigest()
+        return None
+
+    def _stream_photo(self, id_photo: str, url: str, remote: dict = None):
+        """
+        Передает одну фотографию из VK на Яндекс.Диск потоком.
+
+        MD5 и SHA-256 содержимого вычисляются по мере получения блоков. Если включена
+        дедупликация или в папке на Яндекс.Диске уже есть файл с таким именем, тело сначала
+        собирается во временный файл (в памяти до spool_size байт), и фотография с уже
+        загруженным содержимым не загружается повторно.
+
+        Файл с тем же именем, но другим содержимым перезаписывается.
+
+        Поток нельзя перемотать, поэтому при неудачной загрузке фотография заново
+        запрашивается из VK (не более upload_retries раз).
+
+        :param id_photo: ID фотографии.
+        :param url: URL для скачивания.
+        :param remote: Сведения о файле на Яндекс.Диске (_remote_file), если известны.
+         По умолчанию берутся из кэша содержимого папки.
+        :return: True, если фотография загружена.
+        """
+        name_img = f'photo_{id_photo}.jpg'
+        if remote is None:
+            remote = self.listing.get(self.name_folder, name_img)
+        for attempt in range(self.upload_retries + 1):
+            if attempt:
+                self.metrics.inc('retries_total', stage='stream', reason='failed')
+                sleep(backoff_delay(attempt - 1))
+            response = self._request_api(url_photo=url, stream=True)
+            if response is None:
+                continue
+
+            digest = hashlib.sha256()
+            md5 = hashlib.md5()
+            size = 0
+
+            def hashing(chunks):
+                nonlocal size
+                for chunk in chunks:
+                    digest.update(chunk)
+                    md5.update(chunk)
+                    size += len(chunk)
+                    yield chunk
+
+            with response:
+                chunks = hashing(self.shaper.throttle(
+                    response.iter_content(chunk_size=self.chunk_size), 'down',
+                    self._priority(id_photo)))
+                spool_first = (self.dedup is not None and self.index is not None) or \
+                    remote is not None
+                if not spool_first:
+                    uploaded = self._upload_stream(name_img, chunks)
+                else:
+                    with SpooledTemporaryFile(max_size=self.spool_size) as spool:
+                        try:
+                            for chunk in chunks:
+                                spool.write(chunk)
+                        except OSError as e:
+                            tqdm.write(f"Ошибка при скачивании фото '{name_img}': {e}")
+                            continue
+                        if self._matches_remote(name_img, size, digest.hexdigest(),
+                                                md5.hexdigest(), remote):
+                            tqdm.write(f"Фото '{name_img}' уже есть в папке на Яндекс.Диске.")
+                            with self._dedup_lock:
+                                self.existing_count += 1
+                            self._mark_saved(id_photo, sha256=digest.hexdigest())
+                            return True
+                        remote_path = self._deduplicate(name_img, digest.hexdigest())
+                        if remote_path is not None:
+                            self._mark_saved(id_photo, remote_path, digest.hexdigest())
+                            return True
+                        if remote is not None:
+                            self._overwrite.add(name_img)
+                        spool.seek(0)
+                        uploaded = self._upload_stream(
+                            name_img, iter(lambda: spool.read(self.chunk_size), b''))
+
+            if uploaded:
+                remote_path = f'{self.name_folder}/{name_img}'
+                with self._count_lock:
+                    self.uploaded_count += 1
+                if self.index is not None:
+                    self.index.save_hash(digest.hexdigest(), remote_path, size, self._account())
+                if self.verify:
+                    self._sources[name_img] = (id_photo, url)
+                self._expect(name_img, size, md5.hexdigest(), digest.hexdigest(),
+                             partial(self._confirm_photo, id_photo, name_img, size,
+                                     digest.hexdigest()))
+                return True
+
+        tqdm.write(f"Произошла ошибка при загрузке фотографии с ID {id_photo}.")
+        with self._count_lock:
+            self.failed_count += 1
+        return False
+
+    def _confirm_photo(self, id_photo: str, name_img: str, size: int, sha256: str):
+        """
+        Завершает потоковую передачу фотографии после проверки: отмечает ее в индексе
+        и в кэше содержимого папки.
+
+        :param id_photo: ID фотографии.
+        :param name_img: Имя файла на Яндекс.Диске.
+        :param size: Размер в байтах.
+        :param sha256: SHA-256 содержимого.
+        """
+        if self.index is not None:
+            self.index.mark_uploaded(self.users_id, id_photo, f'{self.name_folder}/{name_img}',
+                                     sha256, self._destination())
+        self.listing.put(self.name_folder, name_img, size, sha256=sha256)
+
+    def _reupload_photo(self, name_img: str):
+        """
+        Повторно передает из VK фотографию, не совпавшую при проверке.
+
+        :param name_img: Имя файла на Яндекс.Диске.
+        :return: True, если фотография загружена.
+        """
+        id_photo, url = self._sources[name_img]
+        return self._stream_photo(id_photo, url)
+
+    def _destination(self):
+        """
+        Возвращает место назначения для записей индекса: Яндекс.Диск и папку name_folder.
+
+        :return: str
+        """
+        return YandexDiskApi._destination(self)
+
+    def _upload_priority(self, name_img: str):
+        """
+        Определяет класс приоритета загрузки: фотографии и архивы получают класс
+        своего альбома (см. BandwidthShaper.priority_for).
+
+        :param name_img: Имя файла на Яндекс.Диске.
+        :return: int
+        """
+        stem, extension = os.path.splitext(name_img)
+        if stem.startswith('photo_'):
+            return self._priority(stem[len('photo_'):])
+        if stem.startswith('album_') and extension != '.json':
+            id_album = stem[len('album_'):].split('_', 1)[0]
+            return self.shaper.priority_for(self.id_albums_updated.get(id_album))
+        return YandexDiskApi._upload_priority(self, name_img)
+
+    def _mark_uploaded(self, id_photo: str, remote_path: str = None, sha256: str = None):
+        """
+        Учитывает загруженную фотографию и отмечает ее в индексе (если он используется).
+
+        :param id_photo: ID фотографии.
+        :param remote_path: Путь файла на Яндекс.Диске. По умолчанию photo_<ID>.jpg
+         в папке name_folder.
+        :param sha256: SHA-256 содержимого, если известен.
+        """
+        with self._count_lock:
+            self.uploaded_count += 1
+        self._mark_saved(id_photo, remote_path, sha256)
 
-    def __init__(self, name_profile: str, token_yand, token_vk: str = None):
+    def _mark_saved(self, id_photo: str, remote_path: str = None, sha256: str = None):
+        """
+        Отмечает в индексе фотографию, которая уже есть на Яндекс.Диске (загружена ранее
+        или как дубликат), не учитывая ее в uploaded_count.
 
-        VkApi.__init__(self, name_profile, token_vk)
-        YandexDiskApi.__init__(self, token_yand)
+        :param id_photo: ID фотографии.
+        :param remote_path: Путь файла на Яндекс.Диске. По умолчанию photo_<ID>.jpg
+         в папке name_folder.
+        :param sha256: SHA-256 содержимого, если известен.
+        """
+        if self.index is not None:
+            self.index.mark_uploaded(self.users_id, id_photo,
+                                     remote_path or f'{self.name_folder}/photo_{id_photo}.jpg',
+                                     sha256, self._destination())
 
 
 if __name__ == '__main__':
     t = Backup(name_profiles, token_yand='token_yand', token_vk='token_vk')
     t.users_info()
     t.getting_list_albums()
-    t.upload_photo()
-    t.creating_folder()
-    t.saving_photo_disk()
+    t.backup_photos()
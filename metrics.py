@@ -0,0 +1,371 @@
+"""
+Модуль metrics со сбором метрик и трассировки резервного копирования.
+
+Metrics накапливает:
+    - гистограммы задержек HTTP-запросов по конечным точкам (http_request_seconds);
+    - счетчики байт (bytes_in_total, bytes_out_total), повторов (retries_total)
+      и ошибок по кодам (http_errors_total, vk_errors_total);
+    - глубину очередей (queue_depth, текущую и максимальную);
+    - время этапов (stage_seconds);
+    - при trace=True - интервалы (spans) обработки отдельных фотографий.
+
+Итоги сохраняются в JSON-отчет, в текстовый файл для textfile-коллектора Prometheus
+(node_exporter) и в файл трассировки в формате Chrome Trace Event (открывается в Perfetto
+или chrome://tracing).
+
+Запросы к VK и Яндекс.Диску учитываются в SessionPool, поэтому метрики HTTP собираются
+для всех объектов, использующих общий пул соединений.
+
+Пример использования:
+    metrics = Metrics.shared()
+    with metrics.stage('upload'):
+        ...
+    metrics.inc('retries_total', stage='upload', reason='429')
+    metrics.write_json('metrics.json')
+    metrics.write_prometheus('backup.prom')
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from time import monotonic, time
+from urllib.parse import urlsplit
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def endpoint(url: str):
+    """
+    Приводит URL к имени конечной точки для меток метрик.
+
+    Для API VK это имя метода, для REST API Яндекс.Диска - путь без /v1/disk/
+    (ID операций отбрасываются), для CDN и uploader-хостов - имя хоста.
+
+    Args:
+        url (str): URL запроса.
+
+    Returns:
+        str: Имя конечной точки.
+    """
+    parts = urlsplit(url)
+    if parts.path.startswith('/method/'):
+        return f'{parts.netloc}{parts.path}'
+    if parts.path.startswith('/v1/disk/'):
+        path = parts.path[len('/v1/disk/'):]
+        if path.startswith('operations'):
+            path = 'operations'
+        return f'{parts.netloc}/{path}'
+    return parts.netloc
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными границами корзин.
+
+    Attributes:
+        counts (list): Количество наблюдений в каждой корзине (последняя - +Inf).
+        total (float): Сумма наблюдений.
+        count (int): Количество наблюдений.
+    """
+
+    def __init__(self):
+        """
+        Создает пустую гистограмму.
+        """
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """
+        Добавляет наблюдение.
+
+        Args:
+            value (float): Значение в секундах.
+        """
+        position = next((i for i, bound in enumerate(BUCKETS) if value <= bound), len(BUCKETS))
+        self.counts[position] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float):
+        """
+        Оценивает квантиль по верхней границе корзины.
+
+        Args:
+            q (float): Квантиль от 0 до 1.
+
+        Returns:
+            float or None: Оценка в секундах или None, если наблюдений нет.
+        """
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for position, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return BUCKETS[position] if position < len(BUCKETS) else float('inf')
+        return float('inf')
+
+
+class Metrics:
+    """
+    Потокобезопасный сборщик метрик и интервалов трассировки.
+
+    Attributes:
+        trace (bool): Записывать интервалы обработки фотографий.
+        started (float): Время создания (unixtime).
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, trace: bool = False):
+        """
+        Создает пустой сборщик.
+
+        Args:
+            trace (bool, optional): Записывать интервалы (spans). По умолчанию False.
+        """
+        self.trace = trace
+        self.started = time()
+        self._start = monotonic()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._gauge_max = {}
+        self._stages = {}
+        self._spans = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        """
+        Возвращает общий для процесса сборщик, создавая его при первом вызове.
+
+        Returns:
+            Metrics: Сборщик метрик.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """
+        Увеличивает счетчик.
+
+        Args:
+            name (str): Имя счетчика.
+            value (float, optional): Приращение. По умолчанию 1.
+            **labels: Метки.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Добавляет наблюдение в гистограмму.
+
+        Args:
+            name (str): Имя гистограммы.
+            value (float): Значение в секундах.
+            **labels: Метки.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge(self, name: str, value: float, **labels):
+        """
+        Устанавливает текущее значение показателя (например, глубины очереди)
+        и запоминает максимум.
+
+        Args:
+            name (str): Имя показателя.
+            value (float): Значение.
+            **labels: Метки.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+            self._gauge_max[key] = max(self._gauge_max.get(key, value), value)
+
+    def request(self, method: str, url: str, seconds: float, status: int = None,
+                error: str = None, bytes_in: int = 0, bytes_out: int = 0):
+        """
+        Учитывает HTTP-запрос: задержку, переданные байты и ошибки.
+
+        Args:
+            method (str): HTTP-метод.
+            url (str): URL запроса.
+            seconds (float): Время до получения заголовков ответа.
+            status (int, optional): Код ответа.
+            error (str, optional): Имя исключения, если ответ не получен.
+            bytes_in (int, optional): Получено байт.
+            bytes_out (int, optional): Отправлено байт.
+        """
+        name = endpoint(url)
+        self.observe('http_request_seconds', seconds, endpoint=name, method=method)
+        if bytes_in:
+            self.inc('bytes_in_total', bytes_in, endpoint=name)
+        if bytes_out:
+            self.inc('bytes_out_total', bytes_out, endpoint=name)
+        if error is not None:
+            self.inc('http_errors_total', endpoint=name, code=error)
+        elif status is not None and status >= 400:
+            self.inc('http_errors_total', endpoint=name, code=str(status))
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Измеряет время этапа (время повторных этапов с тем же именем складывается).
+
+        Args:
+            name (str): Имя этапа.
+        """
+        start = monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._stages[name] = self._stages.get(name, 0.0) + monotonic() - start
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Записывает интервал трассировки (если trace=True).
+
+        Args:
+            name (str): Имя интервала, например 'photo' или 'upload'.
+            **attributes: Атрибуты интервала (ID фотографии и т.д.).
+        """
+        if not self.trace:
+            yield
+            return
+        start = monotonic()
+        try:
+            yield
+        finally:
+            span = {'name': name, 'start': start - self._start, 'duration': monotonic() - start,
+                    'thread': threading.get_ident(), 'attributes': attributes}
+            with self._lock:
+                self._spans.append(span)
+
+    def report(self):
+        """
+        Собирает итоги в словарь для JSON-отчета.
+
+        Returns:
+            dict: {'started', 'seconds', 'stages', 'counters', 'latency', 'queues', 'spans'}
+        """
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            latency = [{'name': name, 'labels': dict(labels), 'count': histogram.count,
+                        'sum': round(histogram.total, 6),
+                        'p50': histogram.quantile(0.5), 'p95': histogram.quantile(0.95),
+                        'p99': histogram.quantile(0.99)}
+                       for (name, labels), histogram in sorted(self._histograms.items())]
+            queues = [{'name': name, 'labels': dict(labels), 'value': value,
+                       'max': self._gauge_max[(name, labels)]}
+                      for (name, labels), value in sorted(self._gauges.items())]
+            stages = {name: round(seconds, 3) for name, seconds in self._stages.items()}
+            spans = len(self._spans)
+        return {'started': self.started, 'seconds': round(monotonic() - self._start, 3),
+                'stages': stages, 'counters': counters, 'latency': latency,
+                'queues': queues, 'spans': spans}
+
+    def write_json(self, path: str):
+        """
+        Сохраняет JSON-отчет.
+
+        Args:
+            path (str): Путь к файлу.
+        """
+        self._write(path, json.dumps(self.report(), ensure_ascii=False, indent=4))
+
+    def write_prometheus(self, path: str, prefix: str = 'backup_'):
+        """
+        Сохраняет метрики в текстовом формате Prometheus (для textfile-коллектора).
+
+        Args:
+            path (str): Путь к файлу (обычно с расширением .prom).
+            prefix (str, optional): Префикс имен метрик. По умолчанию 'backup_'.
+        """
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f'# TYPE {prefix}{name} counter')
+                lines += [f'{prefix}{name}{self._labels(labels)} {value}'
+                          for (counter, labels), value in sorted(self._counters.items())
+                          if counter == name]
+
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f'# TYPE {prefix}{name} histogram')
+                for (histogram_name, labels), histogram in sorted(self._histograms.items()):
+                    if histogram_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip((*BUCKETS, '+Inf'), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{prefix}{name}_bucket'
+                                     f'{self._labels(labels + (("le", bound),))} {cumulative}')
+                    lines.append(f'{prefix}{name}_sum{self._labels(labels)} {histogram.total}')
+                    lines.append(f'{prefix}{name}_count{self._labels(labels)} {histogram.count}')
+
+            for name in sorted({name for name, _ in self._gauges}):
+                lines.append(f'# TYPE {prefix}{name} gauge')
+                for (gauge, labels), value in sorted(self._gauges.items()):
+                    if gauge == name:
+                        lines.append(f'{prefix}{name}{self._labels(labels)} {value}')
+                        lines.append(f'{prefix}{name}_max{self._labels(labels)} '
+                                     f'{self._gauge_max[(gauge, labels)]}')
+
+            lines.append(f'# TYPE {prefix}stage_seconds gauge')
+            lines += [f'{prefix}stage_seconds{self._labels((("stage", name),))} {seconds}'
+                      for name, seconds in sorted(self._stages.items())]
+        self._write(path, '\n'.join(lines) + '\n')
+
+    def write_trace(self, path: str):
+        """
+        Сохраняет интервалы трассировки в формате Chrome Trace Event.
+
+        Args:
+            path (str): Путь к файлу.
+        """
+        with self._lock:
+            events = [{'name': span['name'], 'ph': 'X', 'pid': os.getpid(),
+                       'tid': span['thread'], 'ts': int(span['start'] * 1e6),
+                       'dur': int(span['duration'] * 1e6), 'args': span['attributes']}
+                      for span in self._spans]
+        self._write(path, json.dumps({'traceEvents': events}, ensure_ascii=False))
+
+    @staticmethod
+    def _labels(labels: tuple):
+        """
+        Форматирует метки в синтаксисе Prometheus.
+        """
+        if not labels:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in labels)
+        return '{' + ','.join(f'{key}="{value}"'
+                              for (key, _), value in zip(labels, escaped)) + '}'
+
+    @staticmethod
+    def _write(path: str, text: str):
+        """
+        Записывает файл целиком через временный файл, чтобы читатели не видели
+        частично записанный файл.
+        """
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+
+if __name__ == '__main__':
+    pass
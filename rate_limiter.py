@@ -0,0 +1,168 @@
+"""
+Модуль rate_limiter для ограничения частоты запросов к API VK и Яндекс.Диска.
+
+TokenBucket пропускает не более rate запросов в секунду (с запасом capacity на всплески).
+При ответе "слишком много запросов" (VK error_code 6, HTTP 429/503) вызывается throttled():
+все потоки, использующие ведро, ждут указанную паузу, а скорость снижается вдвое.
+После успешных запросов succeeded() постепенно возвращает скорость к исходной.
+
+Ведра, полученные через TokenBucket.shared() с одним ключом (например, токеном),
+общие для всех объектов в процессе, поэтому лимит соблюдается всеми потоками сразу.
+
+Пример использования:
+    bucket = TokenBucket.shared(f'vk:{token}', rate=3)
+    bucket.acquire()
+    response = requests.get(...)
+    if response.status_code in THROTTLE_STATUSES:
+        bucket.throttled(retry_after(response) or backoff_delay(attempt))
+"""
+import random
+import threading
+from time import monotonic, sleep
+
+THROTTLE_STATUSES = (429, 503)
+VK_RATE_LIMIT_ERROR = 6
+
+
+class TokenBucket:
+    """
+    Потокобезопасное ведро токенов с адаптивной скоростью.
+
+    Attributes:
+        max_rate (float): Исходная (максимальная) скорость, запросов в секунду.
+        rate (float): Текущая скорость с учетом ограничений сервера.
+        min_rate (float): Минимальная скорость, ниже которой rate не опускается.
+        capacity (float): Максимальное количество накопленных токенов.
+    """
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, rate: float, capacity: float = None, min_rate: float = None):
+        """
+        Инициализирует ведро токенов.
+
+        Args:
+            rate (float): Запросов в секунду.
+            capacity (float, optional): Размер ведра. По умолчанию равен rate (не меньше 1).
+            min_rate (float, optional): Нижняя граница скорости. По умолчанию rate / 10.
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 10
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+
+        self._tokens = self.capacity
+        self._updated = monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, key: str, rate: float, capacity: float = None):
+        """
+        Возвращает общее для процесса ведро для ключа key, создавая его при необходимости.
+
+        Args:
+            key (str): Ключ ведра, например 'vk:<токен>'.
+            rate (float): Запросов в секунду (используется только при создании).
+            capacity (float, optional): Размер ведра (используется только при создании).
+
+        Returns:
+            TokenBucket: Ведро токенов.
+        """
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(rate, capacity)
+            return cls._shared[key]
+
+    def acquire(self):
+        """
+        Блокирует поток, пока не появится свободный токен, и забирает его.
+        """
+        while True:
+            with self._lock:
+                now = monotonic()
+                self._tokens = min(self.capacity,
+                                   self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            sleep(wait)
+
+    def throttled(self, delay: float):
+        """
+        Учитывает ответ сервера о превышении лимита.
+
+        Все потоки приостанавливаются на delay секунд, накопленные токены сбрасываются,
+        скорость снижается вдвое (но не ниже min_rate).
+
+        Args:
+            delay (float): Пауза в секундах.
+        """
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, monotonic() + delay)
+            self._tokens = 0
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def succeeded(self):
+        """
+        Учитывает успешный запрос: скорость понемногу возвращается к max_rate.
+        """
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0):
+    """
+    Вычисляет паузу перед повтором с экспоненциальным ростом и случайным разбросом.
+
+    Args:
+        attempt (int): Номер попытки, начиная с 0.
+        base (float, optional): Пауза для первой попытки. По умолчанию 0.5 с.
+        cap (float, optional): Максимальная пауза. По умолчанию 30 с.
+
+    Returns:
+        float: Пауза в секундах в диапазоне [d/2, d], где d = min(cap, base * 2 ** attempt).
+    """
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def retry_after(response):
+    """
+    Читает заголовок Retry-After ответа сервера.
+
+    Args:
+        response (requests.Response): Ответ сервера.
+
+    Returns:
+        float or None: Пауза в секундах или None, если заголовка нет или он не число.
+    """
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def is_vk_rate_error(response):
+    """
+    Проверяет, что ответ API VK сообщает о превышении частоты запросов (error_code 6).
+
+    Args:
+        response (requests.Response): Ответ API VK.
+
+    Returns:
+        bool: True, если это ошибка 6.
+    """
+    try:
+        return response.json()['error']['error_code'] == VK_RATE_LIMIT_ERROR
+    except (ValueError, KeyError, TypeError):
+        return False
+
+
+if __name__ == '__main__':
+    pass
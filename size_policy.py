@@ -0,0 +1,187 @@
+"""
+Модуль size_policy с правилами выбора размера фотографии VK для скачивания.
+
+У каждой фотографии в ответе photos.get есть массив sizes с копиями разного размера
+(type - буква размера, width, height, url), а при наличии прав - оригинал orig_photo.
+SizePolicy выбирает одну копию по правилам:
+    - по умолчанию самую большую по ширине x высоте (последний элемент sizes
+      не обязательно самый большой);
+    - originals=True - оригинал orig_photo, если он есть;
+    - type_letter - копию с заданной буквой (например 'x' - до 604 px);
+    - max_pixels - самую большую копию не больше заданного числа пикселей;
+    - max_bytes - общий бюджет байт на альбом или на весь запуск (scope), который
+      делится поровну между еще не выбранными фотографиями.
+Правила применяются последовательно. Размер копии оценивается как число пикселей,
+умноженное на bytes_per_pixel, потому что VK не сообщает размер файла.
+
+Пример использования:
+    policy = SizePolicy(max_pixels=1_000_000)
+    size = policy.select(item)
+    policy.report()
+"""
+
+
+class SizePolicy:
+    """
+    Правила выбора копии фотографии из массива sizes.
+
+    Attributes:
+        type_letter (str or None): Буква нужного размера.
+        max_pixels (int or None): Максимум пикселей в выбранной копии.
+        max_bytes (int or None): Бюджет байт (оценка) на scope.
+        scope (str): 'album' - бюджет на каждый альбом, 'run' - на весь запуск.
+        originals (bool): Предпочитать оригинал orig_photo.
+        bytes_per_pixel (float): Средний размер JPEG в байтах на пиксель.
+        selected_bytes (int): Оценка байт выбранных копий.
+        largest_bytes (int): Оценка байт самых больших копий из sizes тех же фотографий.
+    """
+    # Порядок букв по возрастанию размера и примерная длинная сторона копии в пикселях
+    # (для старых фотографий VK возвращает width и height равными 0).
+    type_sides = {'s': 75, 'm': 130, 'o': 130, 'p': 200, 'q': 320, 'r': 510,
+                  'x': 604, 'y': 807, 'z': 1080, 'w': 2560, 'base': 2560}
+
+    def __init__(self, type_letter: str = None, max_pixels: int = None,
+                 max_bytes: int = None, scope: str = 'run', originals: bool = False,
+                 bytes_per_pixel: float = 0.3):
+        """
+        Создает правила выбора размера.
+
+        Args:
+            type_letter (str, optional): Буква размера. Если у фотографии такой копии нет,
+             используются остальные правила.
+            max_pixels (int, optional): Максимум пикселей (ширина x высота).
+            max_bytes (int, optional): Бюджет байт на альбом или на запуск.
+            scope (str, optional): Область бюджета: 'album' или 'run'. По умолчанию 'run'.
+            originals (bool, optional): Выбирать оригинал, если он доступен. По умолчанию False.
+            bytes_per_pixel (float, optional): Байт на пиксель для оценки размера. По умолчанию 0.3.
+
+        Raises:
+            ValueError: Если scope не 'album' и не 'run'.
+        """
+        if scope not in ('album', 'run'):
+            raise ValueError(f"Неизвестная область бюджета: {scope}")
+        self.type_letter = type_letter
+        self.max_pixels = max_pixels
+        self.max_bytes = max_bytes
+        self.scope = scope
+        self.originals = originals
+        self.bytes_per_pixel = bytes_per_pixel
+        self.selected_bytes = 0
+        self.largest_bytes = 0
+        self._budget = None
+        self._photos_left = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Создает правила из словаря настроек (например, из файла заданий).
+
+        Args:
+            config (dict or SizePolicy or None): Параметры __init__.
+
+        Returns:
+            SizePolicy: Правила выбора размера.
+        """
+        if isinstance(config, cls):
+            return config
+        return cls(**(config or {}))
+
+    def begin_run(self, photos: int):
+        """
+        Начинает запуск: при scope='run' бюджет делится на photos фотографий.
+
+        Args:
+            photos (int): Сколько фотографий планируется скачать за запуск.
+        """
+        if self.scope == 'run':
+            self._start_budget(photos)
+
+    def begin_album(self, photos: int):
+        """
+        Начинает альбом: при scope='album' бюджет делится на photos фотографий альбома.
+
+        Args:
+            photos (int): Сколько фотографий альбома планируется скачать.
+        """
+        if self.scope == 'album':
+            self._start_budget(photos)
+
+    def _start_budget(self, photos: int):
+        """
+        Восстанавливает бюджет max_bytes на photos фотографий.
+        """
+        self._budget = self.max_bytes
+        self._photos_left = photos
+
+    def select(self, item: dict):
+        """
+        Выбирает копию фотографии.
+
+        Args:
+            item (dict): Элемент items ответа photos.get.
+
+        Returns:
+            dict: Выбранный элемент sizes (или orig_photo) с ключами type, url, width, height.
+        """
+        candidates = sorted(item['sizes'], key=self._area)
+        largest = candidates[-1]
+
+        if self.originals and item.get('orig_photo'):
+            chosen = item['orig_photo']
+        else:
+            if self.type_letter:
+                candidates = [size for size in candidates
+                              if size['type'] == self.type_letter] or candidates
+            if self.max_pixels:
+                candidates = [size for size in candidates
+                              if self._area(size) <= self.max_pixels] or candidates[:1]
+            if self.max_bytes is not None and self._budget is not None:
+                allowance = self._budget / max(self._photos_left, 1)
+                candidates = [size for size in candidates
+                              if self.estimate(size) <= allowance] or candidates[:1]
+            chosen = candidates[-1]
+
+        if self._budget is not None:
+            self._budget -= self.estimate(chosen)
+            self._photos_left -= 1
+        self.selected_bytes += self.estimate(chosen)
+        self.largest_bytes += self.estimate(largest)
+        return chosen
+
+    def estimate(self, size: dict):
+        """
+        Оценивает размер файла копии в байтах.
+
+        Args:
+            size (dict): Элемент sizes.
+
+        Returns:
+            int: Оценка размера в байтах.
+        """
+        return int(self._area(size) * self.bytes_per_pixel)
+
+    def _area(self, size: dict):
+        """
+        Возвращает число пикселей копии; для копий без width/height - оценку по букве.
+        """
+        if size.get('width') and size.get('height'):
+            return size['width'] * size['height']
+        side = self.type_sides.get(size.get('type'), 0)
+        return side * side * 3 // 4
+
+    def report(self):
+        """
+        Печатает, сколько байт сэкономлено по сравнению с самыми большими копиями из sizes
+        (для оригиналов - сколько байт добавилось).
+        """
+        if not self.largest_bytes:
+            return
+        saved = self.largest_bytes - self.selected_bytes
+        print(f"Выбор размеров: примерно {self.selected_bytes / 2 ** 20:.1f} МБ вместо "
+              f"{self.largest_bytes / 2 ** 20:.1f} МБ, "
+              f"{'экономия' if saved >= 0 else 'дополнительно'} около "
+              f"{abs(saved) / 2 ** 20:.1f} МБ ({abs(saved) / self.largest_bytes:.0%}).")
+
+
+if __name__ == '__main__':
+    pass
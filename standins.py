@@ -0,0 +1,478 @@
+"""
+Модуль standins с локальными HTTP-серверами, заменяющими API VK и Яндекс.Диска.
+
+Серверы нужны для воспроизводимых измерений производительности без сети и токенов:
+    VkStandIn   - методы users.get, photos.getAlbums, photos.get, execute и CDN
+                  с фотографиями (/cdn/...);
+    DiskStandIn - resources (создание папки, постраничный список), resources/upload
+                  (ссылка для загрузки и загрузка по URL), resources/copy, operations
+                  и uploader-хост (/upload/...), принимающий тело файла.
+
+Для каждого сервера задаются:
+    latency    - задержка перед ответом, в секундах;
+    bandwidth  - скорость передачи тела на одно соединение, байт в секунду (0 - без ограничения);
+    error_rate - доля ответов HTTP 500;
+    rate_limit - запросов к методам API в секунду (0 - без ограничения); сверх лимита VK
+                 отвечает ошибкой 6, Яндекс.Диск - HTTP 429 с Retry-After.
+Содержимое фотографий генерируется по ID, загруженные файлы не хранятся - запоминаются
+только размер, MD5 и SHA-256.
+
+Пример использования:
+    with VkStandIn(albums={'-6': 100}, latency=0.02) as vk, DiskStandIn() as disk:
+        backup = Backup('bench', token_yand='t', token_vk='t', vk_url=vk.api_url,
+                        disk_url=disk.api_url, albums={'-6': 100}, name_folder='bench')
+"""
+import hashlib
+import json
+import random
+import threading
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic, sleep, time
+from urllib.parse import parse_qsl, quote, unquote, urlsplit
+
+import requests
+
+
+class StandInServer:
+    """
+    Базовый локальный сервер с имитацией задержки, скорости, ошибок и лимитов.
+
+    Attributes:
+        latency (float): Задержка перед ответом, с.
+        bandwidth (float): Скорость передачи тела на соединение, байт/с (0 - без ограничения).
+        error_rate (float): Доля ответов HTTP 500.
+        rate_limit (float): Запросов к API в секунду (0 - без ограничения).
+        url (str): Базовый URL сервера, например 'http://127.0.0.1:8080'.
+        requests_count (int): Количество обработанных запросов.
+    """
+    block = 64 * 1024
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 bandwidth: float = 0, error_rate: float = 0.0, rate_limit: float = 0,
+                 seed: int = 0):
+        """
+        Создает сервер (запускается методом start или в блоке with).
+
+        Args:
+            host (str, optional): Адрес. По умолчанию '127.0.0.1'.
+            port (int, optional): Порт (0 - любой свободный). По умолчанию 0.
+            latency (float, optional): Задержка ответа, с. По умолчанию 0.
+            bandwidth (float, optional): Байт в секунду на соединение. По умолчанию 0.
+            error_rate (float, optional): Доля ошибок 500. По умолчанию 0.
+            rate_limit (float, optional): Запросов к API в секунду. По умолчанию 0.
+            seed (int, optional): Начальное значение генератора ошибок. По умолчанию 0.
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.requests_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = (0, 0)
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self.url = f'http://{host}:{self._server.server_address[1]}'
+        self._thread = None
+
+    def start(self):
+        """
+        Запускает сервер в фоновом потоке.
+
+        Returns:
+            StandInServer: Этот сервер.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Останавливает сервер.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler_class(self):
+        """
+        Создает класс обработчика запросов, связанный с этим сервером.
+        """
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server._dispatch(self, 'GET')
+
+            def do_POST(self):
+                server._dispatch(self, 'POST')
+
+            def do_PUT(self):
+                server._dispatch(self, 'PUT')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _dispatch(self, handler, method: str):
+        """
+        Применяет задержку и случайные ошибки и передает запрос в route.
+        """
+        with self._lock:
+            self.requests_count += 1
+            failed = self._random.random() < self.error_rate
+        if self.latency:
+            sleep(self.latency)
+        parts = urlsplit(handler.path)
+        query = dict(parse_qsl(parts.query))
+        if failed:
+            self._read_body(handler)
+            self._send(handler, 500, b'Internal Server Error', 'text/plain')
+            return
+        try:
+            self.route(handler, method, unquote(parts.path), query)
+        except (ConnectionError, TimeoutError):
+            pass
+
+    def route(self, handler, method: str, path: str, query: dict):
+        """
+        Обрабатывает запрос (переопределяется в наследниках).
+        """
+        self._send_json(handler, 404, {'error': 'not found'})
+
+    def _limited(self):
+        """
+        Учитывает запрос к API и проверяет превышение rate_limit в текущей секунде.
+
+        Returns:
+            bool: True, если лимит превышен.
+        """
+        if not self.rate_limit:
+            return False
+        with self._lock:
+            second, count = self._window
+            now = int(time())
+            count = count + 1 if second == now else 1
+            self._window = (now, count)
+            return count > self.rate_limit
+
+    def _read_body(self, handler):
+        """
+        Читает тело запроса (с Content-Length или chunked) с учетом bandwidth.
+
+        Returns:
+            tuple: (размер, MD5, SHA-256, тело - если оно меньше 1 МБ, иначе None)
+        """
+        md5, sha256 = hashlib.md5(), hashlib.sha256()
+        size, kept = 0, []
+        start = monotonic()
+
+        def consume(chunk):
+            nonlocal size
+            md5.update(chunk)
+            sha256.update(chunk)
+            size += len(chunk)
+            if size <= 1024 * 1024:
+                kept.append(chunk)
+            self._pace(size, start)
+
+        if handler.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                length = int(handler.rfile.readline().split(b';')[0].strip() or b'0', 16)
+                if not length:
+                    handler.rfile.readline()
+                    break
+                left = length
+                while left:
+                    chunk = handler.rfile.read(min(left, self.block))
+                    left -= len(chunk)
+                    consume(chunk)
+                handler.rfile.readline()
+        else:
+            left = int(handler.headers.get('Content-Length', 0))
+            while left:
+                chunk = handler.rfile.read(min(left, self.block))
+                if not chunk:
+                    break
+                left -= len(chunk)
+                consume(chunk)
+        body = b''.join(kept) if size <= 1024 * 1024 else None
+        return size, md5.hexdigest(), sha256.hexdigest(), body
+
+    def _pace(self, sent: int, start: float):
+        """
+        Приостанавливает передачу, чтобы скорость не превышала bandwidth.
+        """
+        if self.bandwidth:
+            ahead = sent / self.bandwidth - (monotonic() - start)
+            if ahead > 0:
+                sleep(ahead)
+
+    def _send(self, handler, status: int, body: bytes, content_type: str,
+              headers: dict = None):
+        """
+        Отправляет ответ блоками с учетом bandwidth.
+        """
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        start = monotonic()
+        for offset in range(0, len(body), self.block):
+            handler.wfile.write(body[offset:offset + self.block])
+            self._pace(offset + self.block, start)
+
+    def _send_json(self, handler, status: int, data, headers: dict = None):
+        """
+        Отправляет ответ в формате JSON.
+        """
+        self._send(handler, status, json.dumps(data, ensure_ascii=False).encode('utf-8'),
+                   'application/json', headers)
+
+
+class VkStandIn(StandInServer):
+    """
+    Локальная замена API VK и CDN с фотографиями.
+
+    Attributes:
+        albums (dict): {ID альбома: количество фотографий}.
+        photo_size (int): Размер самой большой копии фотографии (тип 'w') в байтах.
+        api_url (str): Базовый URL методов API для VkApi(api_url=...).
+    """
+    user_id = 1
+    sizes = (('m', 130, 0.03), ('x', 604, 0.25), ('w', 2560, 1.0))
+
+    def __init__(self, albums: dict = None, photo_size: int = 200 * 1024, **kwargs):
+        """
+        Создает сервер.
+
+        Args:
+            albums (dict, optional): {ID альбома: количество фото}. По умолчанию {'-6': 100}.
+            photo_size (int, optional): Размер фотографии в байтах. По умолчанию 200 КБ.
+            **kwargs: Параметры StandInServer.
+        """
+        super().__init__(**kwargs)
+        self.albums = {str(id_album): size for id_album, size in (albums or {'-6': 100}).items()}
+        self.photo_size = photo_size
+        self.api_url = f'{self.url}/method/'
+
+    def route(self, handler, method: str, path: str, query: dict):
+        if path.startswith('/cdn/'):
+            self._photo(handler, path)
+            return
+        if not path.startswith('/method/'):
+            super().route(handler, method, path, query)
+            return
+
+        if method == 'POST':
+            _, _, _, body = self._read_body(handler)
+            query.update(parse_qsl((body or b'').decode('utf-8')))
+        if self._limited():
+            self._send_json(handler, 200, {'error': {'error_code': 6,
+                                                     'error_msg': 'Too many requests per second'}})
+            return
+
+        name = path[len('/method/'):]
+        if name == 'execute':
+            self._send_json(handler, 200, {'response': self._execute(query.get('code', ''))})
+        else:
+            self._send_json(handler, 200, self._call(name, query))
+
+    def _call(self, name: str, params: dict):
+        """
+        Выполняет метод API и возвращает ответ в формате VK.
+        """
+        if name == 'users.get':
+            return {'response': [{'id': self.user_id, 'first_name': 'Bench',
+                                  'last_name': 'User'}]}
+        if name == 'photos.getAlbums':
+            items = [{'id': id_album, 'size': size, 'title': f'Album {id_album}',
+                      'updated': 0} for id_album, size in self.albums.items()]
+            return {'response': {'count': len(items), 'items': items}}
+        if name == 'photos.get':
+            return {'response': self._photos(str(params.get('album_id')),
+                                             int(params.get('offset', 0)),
+                                             int(params.get('count', 50)))}
+        return {'error': {'error_code': 3, 'error_msg': f'Unknown method {name}'}}
+
+    def _execute(self, code: str):
+        """
+        Выполняет код execute вида 'return [API.method({...}), ...];'.
+        """
+        decoder = json.JSONDecoder()
+        results = []
+        for call in code.split('API.')[1:]:
+            name, arguments = call.split('(', 1)
+            params, _ = decoder.raw_decode(arguments)
+            answer = self._call(name, {key: str(value) for key, value in params.items()})
+            results.append(answer.get('response', False))
+        return results
+
+    def _photos(self, id_album: str, offset: int, count: int):
+        """
+        Формирует страницу photos.get.
+        """
+        total = self.albums.get(id_album, 0)
+        items = []
+        for number in range(offset, min(offset + count, total)):
+            id_photo = zlib.crc32(id_album.encode()) % 10_000 * 1_000_000 + number
+            items.append({'id': id_photo, 'album_id': id_album, 'owner_id': self.user_id,
+                          'date': 1_700_000_000 + number,
+                          'sizes': [{'type': letter, 'width': side, 'height': side * 3 // 4,
+                                     'url': f'{self.url}/cdn/{letter}/{id_photo}.jpg'}
+                                    for letter, side, _ in self.sizes]})
+        return {'count': total, 'items': items}
+
+    def _photo(self, handler, path: str):
+        """
+        Отдает содержимое фотографии, сгенерированное по ID и типу размера.
+        """
+        _, _, letter, name = path.split('/')
+        share = next((share for size, _, share in self.sizes if size == letter), 1.0)
+        size = int(self.photo_size * share)
+        seed = hashlib.sha256(name.encode()).digest()
+        body = (seed * (size // len(seed) + 1))[:size]
+        self._send(handler, 200, body, 'image/jpeg')
+
+
+class DiskStandIn(StandInServer):
+    """
+    Локальная замена REST API Яндекс.Диска и uploader-хоста.
+
+    Attributes:
+        files (dict): {путь: {'name', 'type', 'size', 'md5', 'sha256'}} загруженных файлов
+         и созданных папок.
+        api_url (str): Базовый URL REST API для YandexDiskApi(disk_url=...).
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Создает сервер.
+
+        Args:
+            **kwargs: Параметры StandInServer.
+        """
+        super().__init__(**kwargs)
+        self.files = {}
+        self._operations = {}
+        self.api_url = f'{self.url}/v1/disk/'
+
+    def route(self, handler, method: str, path: str, query: dict):
+        if path.startswith('/upload/'):
+            self._upload(handler, path[len('/upload/'):])
+            return
+        if not path.startswith('/v1/disk/'):
+            super().route(handler, method, path, query)
+            return
+        self._read_body(handler)
+        if self._limited():
+            self._send_json(handler, 429, {'error': 'TooManyRequestsError'},
+                            {'Retry-After': '1'})
+            return
+
+        name = path[len('/v1/disk/'):]
+        if name == 'resources' and method == 'PUT':
+            created = self._add(query['path'], {'type': 'dir'})
+            self._send_json(handler, 201 if created else 409, {})
+        elif name == 'resources':
+            self._listing(handler, query)
+        elif name == 'resources/upload' and method == 'GET':
+            if query['path'] in self.files and query.get('overwrite') != 'true':
+                self._send_json(handler, 409, {'error': 'DiskResourceAlreadyExistsError'})
+                return
+            self._send_json(handler, 200, {'href': f"{self.url}/upload/{quote(query['path'])}",
+                                           'method': 'PUT'})
+        elif name == 'resources/upload':
+            if query['path'] in self.files:
+                self._send_json(handler, 409, {'error': 'DiskResourceAlreadyExistsError'})
+                return
+            self._send_json(handler, 202, {'href': self._start_operation(query)})
+        elif name == 'resources/copy':
+            source = self.files.get(query['from'])
+            if source is None:
+                self._send_json(handler, 404, {'error': 'DiskNotFoundError'})
+            else:
+                self._add(query['path'], dict(source))
+                self._send_json(handler, 201, {})
+        elif name.startswith('operations/'):
+            status = self._operations.get(name[len('operations/'):])
+            self._send_json(handler, 200 if status else 404, {'status': status})
+        else:
+            super().route(handler, method, path, query)
+
+    def _add(self, path: str, info: dict):
+        """
+        Запоминает файл или папку.
+
+        Returns:
+            bool: True, если ресурса с таким путем еще не было.
+        """
+        with self._lock:
+            created = path not in self.files
+            self.files[path] = {**info, 'name': path.rsplit('/', 1)[-1]}
+        return created
+
+    def _listing(self, handler, query: dict):
+        """
+        Отдает страницу содержимого папки (limit/offset) или сведения о файле.
+        """
+        folder = query['path'].rstrip('/')
+        if folder not in self.files:
+            self._send_json(handler, 404, {'error': 'DiskNotFoundError'})
+            return
+        if self.files[folder]['type'] == 'file':
+            self._send_json(handler, 200, dict(self.files[folder]))
+            return
+        with self._lock:
+            items = [dict(info) for path, info in sorted(self.files.items())
+                     if path.rsplit('/', 1)[0] == folder and path != folder]
+        offset, limit = int(query.get('offset', 0)), int(query.get('limit', 20))
+        self._send_json(handler, 200, {'_embedded': {'items': items[offset:offset + limit],
+                                                     'total': len(items), 'offset': offset,
+                                                     'limit': limit}})
+
+    def _upload(self, handler, path: str):
+        """
+        Принимает тело файла на uploader-хосте.
+        """
+        size, md5, sha256, _ = self._read_body(handler)
+        self._add(unquote(path), {'type': 'file', 'size': size, 'md5': md5, 'sha256': sha256})
+        self._send(handler, 201, b'', 'text/plain')
+
+    def _start_operation(self, query: dict):
+        """
+        Запускает загрузку по URL в фоне и возвращает ссылку на статус операции.
+        """
+        id_operation = uuid.uuid4().hex
+        self._operations[id_operation] = 'in-progress'
+
+        def fetch():
+            try:
+                response = requests.get(query['url'], timeout=30)
+                response.raise_for_status()
+                content = response.content
+                self._add(query['path'], {'type': 'file', 'size': len(content),
+                                          'md5': hashlib.md5(content).hexdigest(),
+                                          'sha256': hashlib.sha256(content).hexdigest()})
+                self._operations[id_operation] = 'success'
+            except requests.exceptions.RequestException:
+                self._operations[id_operation] = 'failed'
+
+        threading.Thread(target=fetch, daemon=True).start()
+        return f'{self.api_url}operations/{id_operation}'
+
+
+if __name__ == '__main__':
+    pass
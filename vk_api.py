@@ -13,11 +13,24 @@
 import os
 import sys
 import re
-from time import sleep
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from time import sleep, monotonic
+from urllib.parse import urlsplit
 import requests
 
 from tqdm import tqdm
 
+from bandwidth import BandwidthShaper
+from backup_index import BackupIndex
+from http_session import SessionPool
+from latency import LatencyTracker
+from rate_limiter import (TokenBucket, THROTTLE_STATUSES, backoff_delay, retry_after,
+                          is_vk_rate_error)
+from size_policy import SizePolicy
+
 
 class VkApi:
     """
@@ -29,7 +42,23 @@ class VkApi:
         access_token (str): Access token для доступа к API ВКонтакте.
         users_id (int): ID пользователя ВКонтакте.
         id_albums_size (dict): Словарь с размерами альбомов пользователя.
+        id_albums_updated (dict): Словарь со временем изменения альбомов (unixtime).
         version (str): Версия API ВКонтакте.
+        workers (int): Количество потоков для скачивания фотографий.
+        per_host (int): Максимум одновременных соединений с одним хостом CDN.
+        retries (int): Количество повторных попыток скачивания одной фотографии.
+        chunk_size (int): Размер блока (в байтах) при потоковом скачивании фотографий.
+        albums (dict or None): Заранее заданный выбор {ID альбома: количество фото};
+         если задан, альбомы и количество не запрашиваются через input().
+        http (SessionPool): Пул HTTP-соединений для запросов к API и CDN.
+        api_limiter (TokenBucket): Общее для токена ограничение частоты запросов к API.
+        index (BackupIndex or None): Индекс уже переданных фотографий.
+        size_policy (SizePolicy): Правила выбора размера скачиваемых фотографий.
+        latency (LatencyTracker): Общая статистика задержек для адаптивных таймаутов.
+        hedge (bool): Дублировать медленные (дольше p95) запросы фотографий к CDN.
+        hedged_count (int): Сколько запросов было продублировано.
+        metrics (Metrics): Сборщик метрик (общий с пулом соединений http).
+        shaper (BandwidthShaper): Общее ограничение скорости скачивания фотографий.
 
     Methods:
         __init__(name_profile: str, token=None, version='5.199'):
@@ -59,18 +88,43 @@ class VkApi:
         upload_photo():
             Загружает фотографии из альбомов пользователя.
 
+        _selecting_photos():
+            Запрашивает альбомы и количество фото, возвращает словарь ID альбома и количества.
+
         _number_photos(id_albums: list):
             Обрабатывает ввод количества фотографий для скачивания.
 
         _url_photos(number_photos: dict):
-            Создает словарь с URL фотографий для скачивания.
+            Лениво перечисляет пары ID и URL фотографий для скачивания.
+
+        _request_batch(calls: list):
+            Выполняет вызовы API пакетами по 25 через execute.
+
+        profiles_info(name_profiles: list):
+            Получает пользователей и альбомы нескольких профилей пакетными запросами.
 
-        _loading(url_photos: dict):
+        _iter_album_photos(id_album: str, quantity: int, first_page: dict = None):
+            Постранично получает фотографии альбома с упреждающей загрузкой страниц.
+
+        _loading(url_photos, total: int = None):
             Загружает фотографии по URL в папку 'photo'.
+
+        _download_photo(id_photo: str, url: str, folder_path: str):
+            Скачивает одну фотографию с повторными попытками.
     """
     url = 'https://api.vk.com/method/'
-
-    def __init__(self, name_profile: str, token_vk: str = None, version='5.199'):
+    page_size = 1000
+    # Первая страница в execute: 25 страниц по page_size превышают лимит размера
+    # ответа execute (ошибка 13), остальные страницы запрашиваются по page_size.
+    first_page_size = 50
+    execute_limit = 25
+
+    def __init__(self, name_profile: str, token_vk: str = None, version='5.199',
+                 workers: int = 8, per_host: int = 4, retries: int = 3,
+                 http: SessionPool = None, api_rate: float = 3, index: BackupIndex = None,
+                 chunk_size: int = 64 * 1024, albums: dict = None,
+                 size_policy: SizePolicy = None, hedge: bool = False, api_url: str = None,
+                 bandwidth: dict = None):
         """
 
         Инициализирует объект VkApi.
@@ -80,14 +134,53 @@ class VkApi:
             token_vk (str, optional): Access token для доступа к API ВКонтакте.
              Если не указан, запрашивается автоматически.
             version (str, optional): Версия API ВКонтакте. По умолчанию '5.199'.
+            workers (int, optional): Количество потоков скачивания. По умолчанию 8.
+            per_host (int, optional): Лимит одновременных соединений с одним хостом.
+             По умолчанию 4.
+            retries (int, optional): Количество повторов при ошибке скачивания. По умолчанию 3.
+            http (SessionPool, optional): Общий пул соединений. Если не указан, создается свой.
+            api_rate (float, optional): Запросов к API в секунду на один токен. По умолчанию 3.
+            index (BackupIndex, optional): Индекс для пропуска уже переданных фотографий.
+            chunk_size (int, optional): Размер блока при скачивании. По умолчанию 64 КБ.
+            albums (dict, optional): Выбор альбомов и количества фото без вопросов пользователю.
+            size_policy (SizePolicy or dict, optional): Правила выбора размера фотографий.
+             По умолчанию выбирается самая большая копия из sizes.
+            hedge (bool, optional): Отправлять повторный запрос фотографии, если ответа нет
+             дольше p95 задержки хоста. По умолчанию False.
+            api_url (str, optional): Базовый URL методов API (например, локального сервера
+             для тестов производительности). По умолчанию 'https://api.vk.com/method/'.
+            bandwidth (dict or BandwidthShaper, optional): Лимиты скорости и расписание
+             (см. BandwidthShaper.configure). По умолчанию без ограничения.
         """
 
+        self.http = http if http is not None else SessionPool(pool_maxsize=per_host)
+        self.metrics = self.http.metrics
+        if api_url is not None:
+            self.url = api_url
         self.id = name_profile
         self.access_token = token_vk if token_vk is not None else self._request_id_application()
+        self.api_limiter = TokenBucket.shared(f'vk:{self.access_token}', rate=api_rate)
         self.users_id = None
         self.id_albums_size = {}
+        self.id_albums_updated = {}
+        self._processed_albums = {}
 
         self.version = version
+        self.workers = workers
+        self.per_host = per_host
+        self.retries = retries
+        self.index = index
+        self.chunk_size = chunk_size
+        self.albums = albums
+        self.size_policy = SizePolicy.from_config(size_policy)
+        self.latency = LatencyTracker.shared()
+        self.hedge = hedge
+        self.hedged_count = 0
+        self._hedge_pool = None
+        self.shaper = BandwidthShaper.from_config(bandwidth)
+        self._photo_priority = {}
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
 
     def _request_id_application(self):
         """
@@ -128,29 +221,122 @@ class VkApi:
 
         return access_token
 
-    def _request_api(self, method: str = None, params: dict = None, url_photo: str = None):
+    def _request_api(self, method: str = None, params: dict = None, url_photo: str = None,
+                     stream: bool = False, post: bool = False, timeout=None):
         """
         Выполняет HTTP-запрос к API.
 
         :param method: Метод API для обычного запроса.
         :param params: Параметры запроса.
         :param url_photo: URL для загрузки фотографии (если указан, используется GET запрос).
+        :param stream: Не читать тело ответа целиком (для потоковой передачи фотографии).
+        :param post: Передать параметры в теле POST-запроса (для длинного кода execute).
+        :param timeout: Таймаут запроса в секундах или пара (соединение, чтение).
+         По умолчанию вычисляется по задержкам метода API или хоста CDN (см. LatencyTracker).
         :return: Объект Response или None в случае ошибки.
+
+        Запросы к методам API проходят через api_limiter. Ответы с error_code 6
+        и HTTP 429/503 повторяются (не более retries раз) после паузы с экспоненциальным
+        ростом, пауза применяется ко всем потокам, использующим тот же токен.
+        Запросы, прерванные по адаптивному таймауту, повторяются сразу.
+        Ответы методов API учитываются в лимите скачивания с приоритетом METADATA.
         """
-        try:
+        for attempt in range(self.retries + 1):
             if url_photo is None:
-                response = requests.get(self.url + method,
-                                        params={**self._common_params(), **params}, timeout=0.5)
-            else:
-                response = requests.get(url_photo, timeout=0.5)
+                self.api_limiter.acquire()
+            key = method if url_photo is None else urlsplit(url_photo).netloc
+            try:
+                if url_photo is None and post:
+                    response = self.http.post(self.url + method,
+                                              data={**self._common_params(), **params},
+                                              timeout=timeout or self.latency.timeout(key))
+                elif url_photo is None:
+                    response = self.http.get(self.url + method,
+                                             params={**self._common_params(), **params},
+                                             timeout=timeout or self.latency.timeout(key))
+                else:
+                    response = self._get_photo(url_photo, key, stream, timeout)
+                self.latency.record(key, response.elapsed.total_seconds())
+
+                throttled = response.status_code in THROTTLE_STATUSES or \
+                    (url_photo is None and is_vk_rate_error(response))
+                if throttled and attempt < self.retries:
+                    delay = retry_after(response) or backoff_delay(attempt)
+                    if url_photo is None:
+                        self.api_limiter.throttled(delay)
+                    response.close()
+                    self.metrics.inc('retries_total', stage='vk_api' if url_photo is None
+                                     else 'vk_cdn', reason='throttled')
+                    sleep(delay)
+                    continue
+
+                response.raise_for_status()  # Проверка на ошибки HTTP
+
+            except requests.exceptions.Timeout as e:
+                # Таймаут учитывается как замер, чтобы следующий таймаут был больше.
+                self.latency.record(key, self.latency.timeout(key)[1])
+                if attempt < self.retries and timeout is None:
+                    self.metrics.inc('retries_total', stage='vk_api' if url_photo is None
+                                     else 'vk_cdn', reason='timeout')
+                    continue
+                print(f"Ошибка при выполнении запроса: {e}")
+                return None
+            except requests.exceptions.RequestException as e:
+                print(f"Ошибка при выполнении запроса: {e}")
+                if e.response is not None:
+                    e.response.close()  # Возвращаем соединение в пул
+                return None
+
+            if url_photo is None and not throttled:
+                self.api_limiter.succeeded()
+            if url_photo is None:
+                self.shaper.acquire('down', len(response.content), self.shaper.METADATA)
+            return response
 
-            response.raise_for_status()  # Проверка на ошибки HTTP
+    def _get_photo(self, url: str, key: str, stream: bool, timeout=None):
+        """
+        Запрашивает фотографию с CDN с адаптивными таймаутами.
 
-        except requests.exceptions.RequestException as e:
-            print(f"Ошибка при выполнении запроса: {e}")
-            return None
+        Если включен hedge и ответ не получен за p95 задержки хоста, тот же запрос
+        отправляется второй раз; используется ответ, пришедший первым, второй закрывается.
 
-        return response
+        :param url: URL фотографии.
+        :param key: Хост CDN.
+        :param stream: Не читать тело ответа целиком.
+        :param timeout: Таймаут запроса (по умолчанию - по статистике хоста).
+        :return: Объект Response.
+        """
+        timeout = timeout or self.latency.timeout(key)
+        delay = self.latency.hedge_delay(key) if self.hedge else None
+        if delay is None:
+            return self.http.get(url, timeout=timeout, stream=stream)
+
+        with self._host_limits_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=self.workers * 2)
+        futures = [self._hedge_pool.submit(self.http.get, url, timeout=timeout, stream=stream)]
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            futures.append(self._hedge_pool.submit(self.http.get, url, timeout=timeout,
+                                                   stream=stream))
+            self.hedged_count += 1
+
+        winner, pending = None, futures
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in done if future.exception() is None), None)
+        for future in futures:
+            if future is not winner:
+                future.add_done_callback(self._discard_response)
+        return (winner or futures[0]).result()
+
+    @staticmethod
+    def _discard_response(future):
+        """
+        Закрывает ненужный ответ дублирующего запроса, возвращая соединение в пул.
+        """
+        if future.exception() is None:
+            future.result().close()
 
     def _common_params(self):
         """
@@ -164,6 +350,86 @@ class VkApi:
 
         return params
 
+    def _execute(self, calls: list):
+        """
+        Выполняет до execute_limit вызовов API одним запросом execute (VKScript).
+
+        :param calls: Список пар (метод API, параметры).
+        :return: Список результатов в порядке calls; None для вызовов, завершившихся ошибкой.
+        """
+        code = 'return [' + ','.join(
+            f'API.{method}({json.dumps(params, ensure_ascii=False)})'
+            for method, params in calls) + '];'
+        response = self._request_api(method='execute', params={'code': code},
+                                     post=True)
+        if response is None:
+            return [None] * len(calls)
+        if 'error' in response.json().keys():
+            self._error_api(response)
+            return [None] * len(calls)
+
+        for error in response.json().get('execute_errors', []):
+            self.metrics.inc('vk_errors_total', code=str(error.get('error_code')))
+            tqdm.write(f"Ошибка в {error.get('method')}: код {error.get('error_code')}, "
+                       f"{error.get('error_msg')}")
+        return [None if result is False else result for result in response.json()['response']]
+
+    def _request_batch(self, calls: list):
+        """
+        Выполняет произвольное количество вызовов API пакетами через execute.
+
+        :param calls: Список пар (метод API, параметры).
+        :return: Список результатов в порядке calls; None для вызовов с ошибкой.
+        """
+        results = []
+        for start in range(0, len(calls), self.execute_limit):
+            results.extend(self._execute(calls[start:start + self.execute_limit]))
+        return results
+
+    def profiles_info(self, name_profiles: list):
+        """
+        Получает пользователей и их альбомы для нескольких профилей минимумом запросов.
+
+        Один users.get на все профили и по одному execute на каждые execute_limit
+        вызовов photos.getAlbums.
+        :param name_profiles: Имена пользователей или ID профилей.
+        :return: Словарь {имя профиля: {'user': данные users.get, 'albums': список альбомов}};
+         профили, которые не найдены или альбомы которых получить не удалось, в него не входят
+        """
+        params = {'user_ids': ','.join(map(str, name_profiles)), 'fields': 'screen_name'}
+        response = self._request_api(method='users.get', params=params)
+        if response is None:
+            return {}
+        if 'error' in response.json().keys():
+            self._error_api(response)
+            return {}
+
+        users = {}
+        for user in response.json()['response']:
+            for name in (str(user['id']), f"id{user['id']}", user.get('screen_name')):
+                users[name] = user
+        found = [name for name in map(str, name_profiles) if name in users]
+
+        albums = self._request_batch([('photos.getAlbums', {'owner_id': users[name]['id'],
+                                                            'need_system': 1})
+                                      for name in found])
+        return {name: {'user': users[name],
+                       'albums': result['items'] if result is not None else []}
+                for name, result in zip(found, albums) if result is not None}
+
+    def use_profile(self, info: dict):
+        """
+        Принимает пользователя и альбомы, полученные заранее через profiles_info,
+        вместо запросов users_info и getting_list_albums.
+
+        :param info: Значение словаря profiles_info для этого профиля.
+        """
+        self.users_id = info['user']['id']
+        for album in info['albums']:
+            if album['size'] > 0:
+                self.id_albums_size[str(album['id'])] = int(album['size'])
+                self.id_albums_updated[str(album['id'])] = album.get('updated')
+
     def _error_api(self, response):
         """
         Обрабатывает ошибки ответа API
@@ -171,10 +437,15 @@ class VkApi:
         :return: str кодом ошибки
         """
         if list(response.json().keys())[0] != 'response':
+            self.metrics.inc('vk_errors_total', code=str(response.json()['error']['error_code']))
             if response.json()['error']['error_code'] == 5:
                 output_ = "Ошибка авторизации ваш токен не действителен"
                 print(output_)
                 sys.exit()
+            elif is_vk_rate_error(response):
+                output_ = "Превышена частота запросов к API VK, повторные попытки не помогли. " \
+                          "Уменьшите api_rate или количество потоков."
+                print(output_)
             else:
                 output_ = f"Произошла ошибка  код ошибки " \
                           f"{response.json()['error']['error_code']}." \
@@ -193,8 +464,9 @@ class VkApi:
         """
         params = {'user_ids': self.id}
 
-        response = requests.get(self.url + 'users.get',
-                                params={**self._common_params(), **params}, timeout=0.5)
+        response = self._request_api(method='users.get', params=params)
+        if response is None:
+            sys.exit()
 
         if 'error' not in response.json().keys() and response.json()['response'] != []:
             self.users_id = response.json()['response'][0]['id']
@@ -215,8 +487,9 @@ class VkApi:
         params = {'owner_id': self.users_id,
                   'need_system': '1'
                   }
-        response = requests.get(self.url + 'photos.getAlbums',
-                                params={**self._common_params(), **params}, timeout=0.5)
+        response = self._request_api(method='photos.getAlbums', params=params)
+        if response is None:
+            sys.exit()
 
         if 'error' not in response.json().keys():
             output_ = f"Количество альбомов у профиля: {response.json()['response']['count']}"
@@ -228,6 +501,7 @@ class VkApi:
                 if size > 0:
                     output_ += f'\nID:{id_albums}, количество фотографий {size}, название: {title}'
                     self.id_albums_size[str(id_albums)] = int(size)
+                    self.id_albums_updated[str(id_albums)] = album.get('updated')
             print(output_)
         else:
             self._error_api(response)
@@ -238,6 +512,19 @@ class VkApi:
         Загружает фотографии из альбомов пользователя в папку 'photo'.
 
         """
+        number_photos = self._selecting_photos()
+        self._loading(self._url_photos(number_photos), total=sum(number_photos.values()))
+
+    def _selecting_photos(self):
+        """
+        Запрашивает у пользователя альбомы и количество фотографий для скачивания.
+
+        Если выбор задан заранее (albums), пользователь не опрашивается.
+        :return: Словарь из ID альбома и требуемого количества фото
+        """
+        if self.albums is not None:
+            return self._preset_photos()
+
         print('\nДля скачивания фото через запятую укажите ID альбомов.\n'
               'Если ничего не указывать то поиск фотографий будет '
               '\nпроходить в альбоме  в "фотографии со страницы пользователя" ')
@@ -250,9 +537,24 @@ class VkApi:
         else:
             id_albums = list(album for album in answer_id.split(','))
 
-        number_photos = self._number_photos(id_albums)
-        url_photos = self._url_photos(number_photos)
-        self._loading(url_photos)
+        return self._number_photos(id_albums)
+
+    def _preset_photos(self):
+        """
+        Проверяет заранее заданный выбор альбомов по списку альбомов профиля.
+
+        Альбомы, которых нет у профиля (или они пусты), пропускаются, количество
+        ограничивается размером альбома.
+        :return: Словарь из ID альбома и требуемого количества фото
+        """
+        number_photos = {}
+        for id_album, quantity in self.albums.items():
+            id_album = str(id_album)
+            if id_album not in self.id_albums_size:
+                tqdm.write(f"Альбом {id_album} профиля {self.id} не найден или пуст, пропущен.")
+                continue
+            number_photos[id_album] = min(int(quantity), self.id_albums_size[id_album])
+        return number_photos
 
     def _number_photos(self, id_albums: list):
         """
@@ -282,32 +584,196 @@ class VkApi:
 
     def _url_photos(self, number_photos: dict):
         """
-        Создает словарь, содержащий ID и URL фотографий, выбранных ранее из альбомов
+        Перечисляет ID и URL фотографий, выбранных ранее из альбомов.
+
+        Генератор ленивый: первые страницы photos.get (по first_page_size фотографий)
+        запрашиваются пакетами через execute (до execute_limit альбомов за запрос),
+        остальные страницы - по page_size по мере потребления,
+        поэтому скачивание начинается до того, как получен весь список.
+        Фотографии, которые по индексу уже загружены на Яндекс.Диск, пропускаются,
+        а неизмененные с последнего копирования альбомы не запрашиваются вовсе.
+        Копия каждой фотографии выбирается правилами size_policy.
+        Если скорость ограничена (shaper), альбомы обходятся от недавно измененных
+        к старым, а фотографии получают класс приоритета своего альбома.
         :param number_photos: словарь из ID альбома и требуемое количества фото для загрузки
-        :return: Словарь из ID фото и URL для скачивания
-        """
-        id_url_photos = {}
-        for id_album, quantity in number_photos.items():
-
-            params = {'owner_id': self.users_id,
-                      'album_id': id_album,
-                      }
-            response = self._request_api(method='photos.get', params=params)
-            if 'error' not in response.json().keys():
-                photo_dict = response.json()['response']['items'][:quantity]
-                for el in photo_dict:
-                    id_photo = el['id']
-                    url = el['sizes'][-1]['url']
-                    id_url_photos[str(id_photo)] = url
-            else:
-                self._error_api(response)
-        return id_url_photos
+        :return: Итератор пар (ID фото, URL для скачивания)
+        """
+        for _, id_photo, url in self._album_photos(number_photos):
+            yield id_photo, url
 
-    def _loading(self, url_photos: dict):
+    def _album_photos(self, number_photos: dict):
         """
-        Загружает фотографии по словарю с парами id и url в папку 'photo' текущей директории.
+        То же, что _url_photos, но вместе с ID альбома: фотографии одного альбома
+        идут подряд, а size_policy начинает запуск (begin_run) один раз на все альбомы.
 
-        :param url_photos: Словарь с парами id и url фотографий.
+        :param number_photos: словарь из ID альбома и требуемое количества фото для загрузки
+        :return: Итератор (ID альбома, ID фото, URL для скачивания)
+        """
+        albums = [(id_album, quantity) for id_album, quantity in number_photos.items()
+                  if not self._album_unchanged(id_album, quantity)]
+        if self.shaper.limited:
+            albums.sort(key=lambda album: self.id_albums_updated.get(album[0]) or 0,
+                        reverse=True)
+        self._processed_albums.update(albums)
+        self.size_policy.begin_run(sum(self._album_quantity(id_album, quantity)
+                                       for id_album, quantity in albums))
+        for start in range(0, len(albums), self.execute_limit):
+            batch = albums[start:start + self.execute_limit]
+            first_pages = self._request_batch(
+                [('photos.get', self._photos_params(id_album, quantity, 0,
+                                                    self.first_page_size))
+                 for id_album, quantity in batch])
+
+            for (id_album, quantity), first_page in zip(batch, first_pages):
+                skipped = 0
+                self.size_policy.begin_album(self._album_quantity(id_album, quantity))
+                for el in self._iter_album_photos(id_album, quantity, first_page):
+                    size = self.size_policy.select(el)
+                    if self.shaper.limited:
+                        self._photo_priority[str(el['id'])] = self.shaper.priority_for(
+                            self.id_albums_updated.get(id_album))
+                    if self.index is not None:
+                        state = self.index.register(self.users_id, id_album, el['id'],
+                                                    size['url'], f"{el['date']}:{size['type']}",
+                                                    self._destination())
+                        if state == BackupIndex.UPLOADED:
+                            skipped += 1
+                            continue
+                    yield id_album, str(el['id']), size['url']
+                if skipped:
+                    tqdm.write(f"Альбом {id_album}: пропущено {skipped} уже сохраненных фото.")
+        self.size_policy.report()
+
+    def _destination(self):
+        """
+        Возвращает место назначения для записей индекса (см. BackupIndex.destination).
+
+        VkApi не знает, куда загружаются фотографии, поэтому место назначения пустое;
+        классы, загружающие фотографии, переопределяют метод.
+
+        :return: str
+        """
+        return ''
+
+    def _priority(self, id_photo: str):
+        """
+        Возвращает класс приоритета фотографии для ограничения скорости.
+
+        :param id_photo: ID фотографии
+        :return: int (BandwidthShaper.RECENT или BandwidthShaper.BULK)
+        """
+        return self._photo_priority.get(str(id_photo), self.shaper.BULK)
+
+    def _album_quantity(self, id_album: str, quantity: int):
+        """
+        Возвращает, сколько фотографий альбома будет получено с учетом его размера.
+
+        :param id_album: ID альбома
+        :param quantity: запрошенное количество фотографий
+        :return: int
+        """
+        return min(quantity, self.id_albums_size.get(id_album, quantity))
+
+    def _album_unchanged(self, id_album: str, quantity: int):
+        """
+        Проверяет по индексу, что альбом не менялся с последнего успешного копирования.
+
+        :param id_album: ID альбома
+        :param quantity: сколько фотографий нужно сохранить
+        :return: bool
+        """
+        if self.index is None or id_album not in self.id_albums_size:
+            return False
+        unchanged = self.index.album_unchanged(self.users_id, id_album,
+                                               self.id_albums_size[id_album],
+                                               self.id_albums_updated.get(id_album), quantity,
+                                               self._destination())
+        if unchanged:
+            tqdm.write(f"Альбом {id_album} не изменился с последнего копирования, пропущен.")
+        return unchanged
+
+    def _remember_albums(self):
+        """
+        Сохраняет в индекс размер и время изменения полностью скопированных альбомов,
+        обработанных в _url_photos.
+        """
+        if self.index is None:
+            return
+        for id_album, quantity in self._processed_albums.items():
+            if id_album in self.id_albums_size and \
+                    self.index.album_complete(self.users_id, id_album, self._destination()):
+                self.index.save_album(self.users_id, id_album, self.id_albums_size[id_album],
+                                      self.id_albums_updated.get(id_album), quantity,
+                                      self._destination())
+        self._processed_albums.clear()
+
+    def _photos_params(self, id_album: str, quantity: int, offset: int, count: int = None):
+        """
+        Формирует параметры photos.get для страницы альбома.
+
+        :param id_album: ID альбома
+        :param quantity: сколько фотографий нужно получить всего
+        :param offset: смещение страницы
+        :param count: размер страницы, по умолчанию page_size
+        :return: dict
+        """
+        return {'owner_id': self.users_id,
+                'album_id': id_album,
+                'count': min(count or self.page_size, quantity - offset),
+                'offset': offset
+                }
+
+    def _fetch_page(self, id_album: str, quantity: int, offset: int):
+        """
+        Запрашивает одну страницу photos.get.
+
+        :return: Словарь с ключами count и items или None в случае ошибки.
+        """
+        response = self._request_api(method='photos.get',
+                                     params=self._photos_params(id_album, quantity, offset))
+        if response is None:
+            tqdm.write(f"Не удалось получить фотографии альбома {id_album} "
+                       f"начиная с {offset}.")
+            return None
+        if 'error' in response.json().keys():
+            self._error_api(response)
+            return None
+        return response.json()['response']
+
+    def _iter_album_photos(self, id_album: str, quantity: int, first_page: dict = None):
+        """
+        Постранично перечисляет фотографии альбома (до page_size за запрос).
+
+        Пока обрабатывается текущая страница, следующая уже запрашивается в фоне.
+        :param id_album: ID альбома
+        :param quantity: сколько фотографий нужно получить
+        :param first_page: уже полученная первая страница (например, из execute)
+        :return: Итератор элементов items ответа photos.get
+        """
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
+            offset = 0
+            page = first_page if first_page is not None \
+                else self._fetch_page(id_album, quantity, offset)
+            while page is not None:
+                items = page['items']
+                offset += len(items)
+                more = items and offset < min(quantity, page['count'])
+                future = prefetch.submit(self._fetch_page, id_album, quantity, offset) \
+                    if more else None
+                yield from items
+                page = future.result() if future is not None else None
+
+    def _loading(self, url_photos, total: int = None):
+        """
+        Загружает фотографии по парам id и url в папку 'photo' текущей директории.
+
+        Фотографии скачиваются параллельно в workers потоках, не более per_host соединений
+        на один хост. Пары берутся из итератора по мере освобождения потоков, поэтому
+        список фотографий не строится заранее. Сообщения о результатах выводятся
+        в исходном порядке фотографий, в конце печатается средняя скорость скачивания.
+
+        :param url_photos: Итератор пар (id, url) фотографий или словарь {id: url}.
+        :param total: Ожидаемое количество фотографий (для прогресс-бара).
         """
         folder_name = 'photo'
         folder_path = os.path.join(os.getcwd(), folder_name)  # Получаем полный путь к папке
@@ -315,18 +781,143 @@ class VkApi:
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
 
-        for id_photo, url in tqdm(url_photos.items(), desc='Скачивание фотографий', unit='фото'):
-            response = self._request_api(url_photo=url)
-            if response:
+        if isinstance(url_photos, dict):
+            total = len(url_photos) if total is None else total
+            url_photos = url_photos.items()
+
+        order = []
+        results = {}
+        pending = {}
+        total_bytes = 0
+        start = monotonic()
+
+        def report(done):
+            nonlocal total_bytes
+            for future in done:
+                size = future.result()
+                results[pending.pop(future)] = size
+                total_bytes += size or 0
+                progress.update()
+            progress.set_postfix_str(self._throughput(total_bytes, start))
+
+            while order and order[0] in results:
+                id_photo = order.pop(0)
+                if results.pop(id_photo) is not None:
+                    tqdm.write(f"Фотография с ID {id_photo} успешно загружена.")
+                else:
+                    tqdm.write(f"Произошла ошибка при загрузке фотографии с ID {id_photo}.")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor, \
+                tqdm(total=total, desc='Скачивание фотографий', unit='фото') as progress:
+            for id_photo, url in url_photos:
+                if len(pending) >= 2 * self.workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    report(done)
+                order.append(id_photo)
+                pending[executor.submit(self._download_photo, id_photo, url, folder_path)] \
+                    = id_photo
+                self.metrics.gauge('queue_depth', len(pending), queue='download')
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                report(done)
+
+        print(f"Скачано {total_bytes / 2 ** 20:.1f} МБ, "
+              f"средняя скорость {self._throughput(total_bytes, start)}")
+
+    def _download_photo(self, id_photo: str, url: str, folder_path: str):
+        """
+        Скачивает одну фотографию в папку folder_path, повторяя запрос при ошибке.
 
-                filename = os.path.join(folder_path, f'photo_{id_photo}.jpg')
+        Паузы между попытками растут экспоненциально и не блокируют остальные потоки.
+        Если по индексу фотография уже скачана и файл на месте, запрос не выполняется.
 
-                with open(filename, 'wb') as f:
-                    f.write(response.content)
-                tqdm.write(f"Фотография с ID {id_photo} успешно загружена.")
-            else:
-                tqdm.write(f"Произошла ошибка при загрузке фотографии с ID {id_photo}.")
-                sleep(5)
+        :param id_photo: ID фотографии.
+        :param url: URL для скачивания.
+        :param folder_path: Папка для сохранения.
+        :return: Размер файла в байтах или None, если все попытки неудачны.
+        """
+        host_limit = self._host_limit(url)
+        name_img = f'photo_{id_photo}.jpg'
+        filename = os.path.join(folder_path, name_img)
+
+        if self.index is not None and os.path.isfile(filename) and \
+                self.index.state(self.users_id, id_photo, self._destination()) == \
+                BackupIndex.DOWNLOADED:
+            return os.path.getsize(filename)
+
+        with self.metrics.span('download', photo_id=id_photo):
+            for attempt in range(self.retries + 1):
+                with host_limit:
+                    size, sha256 = self._save_stream(url, filename, self._priority(id_photo))
+                if size is not None:
+                    if self.index is not None:
+                        self.index.mark_downloaded(self.users_id, id_photo, name_img, sha256,
+                                                   self._destination())
+                    return size
+                if attempt < self.retries:
+                    self.metrics.inc('retries_total', stage='download', reason='failed')
+                    sleep(backoff_delay(attempt))
+        return None
+
+    def _save_stream(self, url: str, filename: str, priority: int = BandwidthShaper.BULK):
+        """
+        Скачивает файл по url блоками по chunk_size байт, не держа его целиком в памяти.
+
+        Данные пишутся во временный файл '<filename>.part', который переименовывается
+        в filename только после полного скачивания. SHA-256 считается по мере получения
+        блоков, без повторного чтения файла. Скорость скачивания ограничивается shaper.
+
+        :param url: URL для скачивания.
+        :param filename: Путь к итоговому файлу.
+        :param priority: Класс приоритета для shaper.
+        :return: Кортеж (размер в байтах, SHA-256) или (None, None) в случае ошибки.
+        """
+        response = self._request_api(url_photo=url, stream=True)
+        if response is None:
+            return None, None
+
+        part_name = f'{filename}.part'
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with response, open(part_name, 'wb') as f:
+                for chunk in self.shaper.throttle(
+                        response.iter_content(chunk_size=self.chunk_size), 'down', priority):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            os.replace(part_name, filename)
+        except (requests.exceptions.RequestException, OSError) as e:
+            print(f"Ошибка при скачивании {url}: {e}")
+            if os.path.exists(part_name):
+                os.remove(part_name)
+            return None, None
+        return size, digest.hexdigest()
+
+    def _host_limit(self, url: str):
+        """
+        Возвращает семафор, ограничивающий число одновременных соединений с хостом url.
+
+        :param url: URL запроса.
+        :return: threading.BoundedSemaphore для хоста.
+        """
+        host = urlsplit(url).netloc
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_limits[host]
+
+    @staticmethod
+    def _throughput(total_bytes: int, start: float):
+        """
+        Форматирует среднюю скорость передачи с момента start.
+
+        :param total_bytes: Количество переданных байт.
+        :param start: Время начала (time.monotonic()).
+        :return: str вида '1.23 МБ/с'
+        """
+        elapsed = max(monotonic() - start, 1e-6)
+        return f'{total_bytes / elapsed / 2 ** 20:.2f} МБ/с'
 
 
 if __name__ == '__main__':
@@ -0,0 +1,210 @@
+"""
+Скрипт для многопроцессной передачи фотографий через общую очередь задач на диске.
+
+Координатор (команда enqueue) читает файл заданий batch_runner, получает списки
+фотографий выбранных альбомов и раскладывает их в очередь JobQueue по одной задаче
+на фотографию. Рабочие процессы (команда run) берут задачи в аренду, передают
+фотографии потоком из VK на Яндекс.Диск и подтверждают выполнение. Если процесс
+упал, его задачи после истечения аренды забирают остальные процессы.
+
+Каждый процесс использует свое ядро для TLS и разбора ответов, поэтому пропускная
+способность растет примерно пропорционально числу процессов.
+
+Пример использования:
+    python worker_pool.py enqueue jobs.json --queue jobs.sqlite3
+    python worker_pool.py run --queue jobs.sqlite3 --processes 8 --threads 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from time import monotonic, sleep
+
+from backup_index import BackupIndex
+from batch_runner import BatchRunner
+from http_session import SessionPool
+from job_queue import JobQueue
+from main import Backup
+
+
+def enqueue(job_file: str, queue_path: str, index_path: str = 'backup_index.sqlite3'):
+    """
+    Раскладывает фотографии всех заданий файла job_file в очередь задач.
+
+    Для каждого профиля создается папка на Яндекс.Диске; фотографии, уже загруженные
+    по индексу, в очередь не попадают.
+
+    Args:
+        job_file (str): Файл заданий (формат batch_runner).
+        queue_path (str): Файл очереди.
+        index_path (str, optional): Файл индекса (None - без индекса).
+
+    Returns:
+        int: Количество добавленных задач.
+    """
+    runner = BatchRunner.from_file(job_file, index_path=index_path)
+    queue = JobQueue(queue_path)
+    added = 0
+
+    for job, profile_info in zip(runner.jobs, runner.resolve_profiles()):
+        try:
+            backup = runner.make_backup(job)
+            if profile_info is not None:
+                backup.use_profile(profile_info)
+            else:
+                backup.users_info()
+                backup.getting_list_albums()
+            backup.creating_folder()
+        except (Exception, SystemExit) as e:
+            print(f"{job['profile']}: задание пропущено ({str(e) or type(e).__name__})")
+            continue
+
+        options = {'vk_url': runner.vk_url, 'disk_url': runner.disk_url,
+                   'dedup': runner.dedup, 'bandwidth': runner.bandwidth,
+                   'size_policy': job.get('size_policy', runner.size_policy)}
+        tasks = ({'owner_id': backup.users_id, 'photo_id': id_photo, 'url': url,
+                  'folder': backup.name_folder, 'token_yand': backup.token, 'options': options}
+                 for id_photo, url in backup._url_photos(backup._selecting_photos()))
+        count = queue.put_many(tasks)
+        added += count
+        print(f"{job['profile']}: в очередь добавлено {count} фото")
+
+    queue.close()
+    return added
+
+
+def worker_main(queue_path: str, threads: int = 4, index_path: str = 'backup_index.sqlite3',
+                lease_seconds: float = 300):
+    """
+    Рабочий процесс: берет задачи из очереди и передает фотографии в threads потоков.
+
+    Задачи берутся в аренду по одной на свободный поток; аренда выполняющихся задач
+    продлевается каждую треть lease_seconds. Задача, при передаче которой возникло
+    исключение, возвращается в очередь (nack). Для задачи, взятой повторно (предыдущий
+    процесс мог упасть после загрузки), сначала проверяется файл на Яндекс.Диске:
+    совпадающий файл не загружается заново, отличающийся перезаписывается.
+    Процесс завершается, когда в очереди не осталось ни свободных задач,
+    ни задач в аренде.
+
+    Args:
+        queue_path (str): Файл очереди.
+        threads (int, optional): Потоков передачи в процессе. По умолчанию 4.
+        index_path (str, optional): Файл индекса (None - без индекса).
+        lease_seconds (float, optional): Срок аренды задачи. По умолчанию 300 с.
+    """
+    name = f'worker-{os.getpid()}'
+    queue = JobQueue(queue_path, lease_seconds=lease_seconds)
+    index = BackupIndex(index_path) if index_path else None
+    http = SessionPool(pool_maxsize=threads)
+    done = failed = 0
+
+    def transfer(task):
+        # Фотографии передаются по одной, поэтому проверка папки целиком здесь не выполняется.
+        options = json.loads(task['options'] or '{}')
+        backup = Backup(task['owner_id'], token_yand=task['token_yand'], token_vk='',
+                        index_path=None, index=index, name_folder=task['folder'], http=http,
+                        verify=False, vk_url=options.get('vk_url'),
+                        disk_url=options.get('disk_url'), dedup=options.get('dedup'),
+                        size_policy=options.get('size_policy'),
+                        bandwidth=options.get('bandwidth'))
+        backup.users_id = task['owner_id']
+        remote = None
+        if task['attempts']:
+            # Предыдущий процесс мог загрузить фото и упасть до подтверждения: сверяем файл
+            # на Яндекс.Диске и, если он отличается, перезаписываем его.
+            name_img = f"photo_{task['photo_id']}.jpg"
+            backup._overwrite.add(name_img)
+            remote = backup._remote_file(name_img)
+        with backup.metrics.span('photo', photo_id=task['photo_id']):
+            return backup._stream_photo(task['photo_id'], task['url'], remote)
+
+    in_flight = {}
+    renewed = monotonic()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        while True:
+            if len(in_flight) < threads:
+                for task in queue.lease(name, threads - len(in_flight)):
+                    in_flight[pool.submit(transfer, task)] = task
+            if not in_flight:
+                counts = queue.counts()
+                if not counts.get(JobQueue.PENDING) and not counts.get(JobQueue.LEASED):
+                    break
+                sleep(1)
+                continue
+
+            finished, _ = wait(in_flight, timeout=1, return_when=FIRST_COMPLETED)
+            for future in finished:
+                task = in_flight.pop(future)
+                try:
+                    uploaded, error = future.result(), 'Не удалось передать фото'
+                except Exception as e:
+                    uploaded, error = False, str(e) or type(e).__name__
+                if uploaded and queue.ack(task['id'], name):
+                    done += 1
+                elif uploaded:
+                    print(f"{name}: аренда задачи {task['id']} истекла до подтверждения")
+                else:
+                    queue.nack(task['id'], name, error)
+                    failed += 1
+            if finished:
+                print(f"{name}: передано {done}, ошибок {failed}")
+
+            if in_flight and monotonic() - renewed > queue.lease_seconds / 3:
+                queue.renew([task['id'] for task in in_flight.values()], name)
+                renewed = monotonic()
+
+    queue.close()
+
+
+def run_workers(queue_path: str, processes: int = None, threads: int = 4,
+                index_path: str = 'backup_index.sqlite3', lease_seconds: float = 300):
+    """
+    Запускает processes рабочих процессов и ждет, пока очередь не опустеет.
+
+    Args:
+        queue_path (str): Файл очереди.
+        processes (int, optional): Количество процессов. По умолчанию - число ядер.
+        threads (int, optional): Потоков передачи в каждом процессе. По умолчанию 4.
+        index_path (str, optional): Файл индекса (None - без индекса).
+        lease_seconds (float, optional): Срок аренды задачи. По умолчанию 300 с.
+
+    Returns:
+        dict: Количество задач по состояниям после завершения.
+    """
+    processes = processes or os.cpu_count() or 1
+    workers = [multiprocessing.Process(target=worker_main,
+                                       args=(queue_path, threads, index_path, lease_seconds))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    queue = JobQueue(queue_path)
+    counts = queue.counts()
+    queue.close()
+    print(f"Очередь: выполнено {counts.get(JobQueue.DONE, 0)}, "
+          f"провалено {counts.get(JobQueue.FAILED, 0)}")
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Многопроцессная передача фотографий')
+    parser.add_argument('--queue', default='jobs.sqlite3', help='Файл очереди задач')
+    parser.add_argument('--index', default='backup_index.sqlite3', help='Файл индекса')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = commands.add_parser('enqueue', help='Разложить задания в очередь')
+    enqueue_parser.add_argument('jobs', help='JSON-файл с заданиями')
+
+    run_parser = commands.add_parser('run', help='Запустить рабочие процессы')
+    run_parser.add_argument('--processes', type=int, default=None)
+    run_parser.add_argument('--threads', type=int, default=4)
+    run_parser.add_argument('--lease', type=float, default=300, help='Срок аренды задачи, с')
+
+    args = parser.parse_args()
+    if args.command == 'enqueue':
+        print(f"Добавлено задач: {enqueue(args.jobs, args.queue, args.index)}")
+    else:
+        run_workers(args.queue, args.processes, args.threads, args.index, args.lease)
@@ -18,13 +18,75 @@
 
 """
 
-import sys
+import hashlib
 import logging
 import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import monotonic, sleep
 import requests
 
 from tqdm import tqdm
 
+from bandwidth import BandwidthShaper, ThrottledFile
+from backup_index import BackupIndex
+from disk_listing import DiskListing
+from http_session import SessionPool
+from rate_limiter import TokenBucket, THROTTLE_STATUSES, backoff_delay, retry_after
+
+
+class HashingFile:
+    """
+    Файл, открытый на чтение, который вычисляет MD5 и SHA-256 прочитанных данных.
+
+    Используется как тело PUT-запроса: контрольные суммы получаются при отправке файла,
+    без отдельного чтения с диска.
+
+    Attributes:
+        md5: Объект hashlib.md5 прочитанных данных.
+        sha256: Объект hashlib.sha256 прочитанных данных.
+    """
+
+    def __init__(self, fileobj):
+        """
+        Оборачивает файл.
+
+        Args:
+            fileobj: Файл, открытый на чтение в двоичном режиме.
+        """
+        self.fileobj = fileobj
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+
+    def __len__(self):
+        """
+        Количество байт, оставшихся до конца файла.
+        """
+        return os.fstat(self.fileobj.fileno()).st_size - self.fileobj.tell()
+
+    def fileno(self):
+        """
+        Дескриптор исходного файла.
+        """
+        return self.fileobj.fileno()
+
+    def tell(self):
+        """
+        Текущая позиция в исходном файле.
+        """
+        return self.fileobj.tell()
+
+    def read(self, size: int = -1):
+        """
+        Читает блок файла и добавляет его к контрольным суммам.
+        """
+        chunk = self.fileobj.read(size)
+        self.md5.update(chunk)
+        self.sha256.update(chunk)
+        return chunk
+
 
 class YandexDiskApi:
     """
@@ -33,17 +95,119 @@ class YandexDiskApi:
         token (str): Токен OAuth для доступа к API Яндекс.Диска.
         name_folder (str or None): Название папки на Яндекс.Диске,
          куда будут загружаться фотографии.
+        upload_workers (int): Количество одновременных загрузок файлов (M).
+        href_ahead (int): Сколько ссылок для загрузки запрашивать заранее (N).
+        upload_retries (int): Количество повторных попыток загрузки одного файла.
+        http (SessionPool): Пул HTTP-соединений для запросов к API и uploader-хостам.
+        disk_limiter (TokenBucket): Общее для токена ограничение частоты запросов к API.
+        index (BackupIndex or None): Индекс уже переданных фотографий.
+        max_operations (int): Максимум одновременных операций загрузки по URL.
+        poll_interval (float): Пауза между опросами статуса операций, в секундах.
+        operation_timeout (float): Время, после которого операция считается неудачной.
+        uploaded_count (int): Количество успешно загруженных файлов.
+        failed_count (int): Количество файлов, которые не удалось загрузить.
+        dedup (str or None): Режим дедупликации по SHA-256: 'skip', 'copy' или None.
+        dedup_count (int): Количество файлов, не загруженных повторно благодаря дедупликации.
+        listing (DiskListing): Кэш содержимого папок на Яндекс.Диске.
+        existing_count (int): Количество файлов, которые уже были в папке и не загружались.
+        metrics (Metrics): Сборщик метрик (общий с пулом соединений http).
+        disk_url (str): Базовый URL REST API Яндекс.Диска.
+        shaper (BandwidthShaper): Общее ограничение скорости загрузки файлов.
+        verify (bool): Проверять загруженные файлы по контрольным суммам Яндекс.Диска.
+        verify_delay (float): Пауза перед повторной проверкой, в секундах.
+        verified_count (int): Количество файлов, прошедших проверку.
+        mismatch_count (int): Количество файлов, не совпавших с отправленными.
     """
+    disk_url = 'https://cloud-api.yandex.net/v1/disk/'
+    listing_page = 1000
 
-    def __init__(self, token_yand: str):
+    def __init__(self, token_yand: str, upload_workers: int = 4, href_ahead: int = 8,
+                 upload_retries: int = 3, http: SessionPool = None, disk_rate: float = 10,
+                 index: BackupIndex = None, max_operations: int = 16,
+                 poll_interval: float = 1.0, operation_timeout: float = 120.0,
+                 name_folder: str = None, dedup: str = None, listing_cache: str = None,
+                 disk_url: str = None, bandwidth: dict = None, verify: bool = True,
+                 verify_delay: float = 2.0):
         """
         Инициализация объекта класса YandexDiskApi.
 
         Args:
             token_yand (str): Токен OAuth для доступа к API Яндекс.Диска.
+            upload_workers (int, optional): Количество одновременных загрузок. По умолчанию 4.
+            href_ahead (int, optional): Количество заранее запрошенных ссылок для загрузки.
+             По умолчанию 8.
+            upload_retries (int, optional): Количество повторов при ошибке загрузки.
+             По умолчанию 3.
+            http (SessionPool, optional): Общий пул соединений. Если не указан, создается свой.
+            disk_rate (float, optional): Запросов к API Яндекс.Диска в секунду. По умолчанию 10.
+            index (BackupIndex, optional): Индекс, в котором отмечаются загруженные фотографии.
+            max_operations (int, optional): Максимум одновременных операций загрузки по URL.
+             По умолчанию 16.
+            poll_interval (float, optional): Пауза между опросами операций. По умолчанию 1 с.
+            operation_timeout (float, optional): Предельное время операции. По умолчанию 120 с.
+            name_folder (str, optional): Папка на Яндекс.Диске. Если не указана,
+             запрашивается у пользователя.
+            dedup (str, optional): Что делать с файлами, содержимое которых уже загружено:
+             'skip' - не загружать, 'copy' - скопировать на сервере, None - загружать.
+            listing_cache (str, optional): Файл для сохранения кэша содержимого папок
+             между запусками. По умолчанию кэш хранится только в памяти.
+            disk_url (str, optional): Базовый URL REST API (например, локального сервера
+             для тестов производительности). По умолчанию - API Яндекс.Диска.
+            bandwidth (dict or BandwidthShaper, optional): Лимиты скорости и расписание
+             (см. BandwidthShaper.configure). По умолчанию без ограничения.
+            verify (bool, optional): Сверять размер и SHA-256/MD5 загруженных файлов
+             с Яндекс.Диском перед удалением локальных копий. По умолчанию True.
+            verify_delay (float, optional): Пауза перед повторной проверкой файлов,
+             для которых Яндекс.Диск еще не вычислил контрольные суммы. По умолчанию 2 с.
         """
+        self.http = http if http is not None else SessionPool(pool_maxsize=upload_workers)
+        self.metrics = self.http.metrics
+        if disk_url is not None:
+            self.disk_url = disk_url
         self.token = token_yand
-        self.name_folder = None
+        self.disk_limiter = TokenBucket.shared(f'yandex:{token_yand}', rate=disk_rate)
+        self.shaper = BandwidthShaper.from_config(bandwidth)
+        self.name_folder = name_folder
+        self.uploaded_count = 0
+        self.failed_count = 0
+        self._count_lock = threading.Lock()
+        self.dedup = dedup
+        self.dedup_count = 0
+        self._dedup_lock = threading.Lock()
+        self.listing = DiskListing(listing_cache)
+        self.existing_count = 0
+        self.upload_workers = upload_workers
+        self.href_ahead = href_ahead
+        self.upload_retries = upload_retries
+        self.index = index
+        self.max_operations = max_operations
+        self.poll_interval = poll_interval
+        self.operation_timeout = operation_timeout
+        self.verify = verify
+        self.verify_delay = verify_delay
+        self.verified_count = 0
+        self.mismatch_count = 0
+        self._unverified = {}
+        self._unverified_lock = threading.Lock()
+        self._overwrite = set()
+
+    def _account(self):
+        """
+        Возвращает идентификатор Яндекс.Диска для таблицы hashes (см. BackupIndex.account).
+
+        Returns:
+            str: Идентификатор диска по токену.
+        """
+        return BackupIndex.account(self.token)
+
+    def _destination(self):
+        """
+        Возвращает место назначения для записей индекса (см. BackupIndex.destination).
+
+        Returns:
+            str: Место назначения: Яндекс.Диск (по токену) и папка name_folder.
+        """
+        return BackupIndex.destination(self.token, self.name_folder)
 
     def _common_headers(self):
         """
@@ -58,6 +222,37 @@ class YandexDiskApi:
         }
         return headers
 
+    def _request_disk(self, method: str, url: str, **kwargs):
+        """
+        Выполняет запрос к REST API Яндекс.Диска с учетом ограничения частоты.
+
+        Ответы HTTP 429/503 повторяются (не более upload_retries раз) после паузы
+        с экспоненциальным ростом; пауза применяется ко всем потокам с тем же токеном.
+        Тело ответа учитывается в лимите скачивания с приоритетом METADATA.
+
+        Args:
+            method (str): HTTP-метод.
+            url (str): URL запроса.
+            **kwargs: Параметры запроса (params, timeout и т.д.).
+
+        Returns:
+            requests.Response: Последний полученный ответ.
+        """
+        for attempt in range(self.upload_retries + 1):
+            self.disk_limiter.acquire()
+            response = self.http.request(method, url, headers=self._common_headers(), **kwargs)
+            if response.status_code not in THROTTLE_STATUSES:
+                self.disk_limiter.succeeded()
+                self.shaper.acquire('down', len(response.content), self.shaper.METADATA)
+                return response
+            if attempt < self.upload_retries:
+                delay = retry_after(response) or backoff_delay(attempt)
+                self.disk_limiter.throttled(delay)
+                self.metrics.inc('retries_total', stage='disk_api',
+                                 reason=str(response.status_code))
+                sleep(delay)
+        return response
+
     def _request_folder_name(self):
         """
         Запрашивает у пользователя название папки для создания на Яндекс.Диске.
@@ -82,16 +277,17 @@ class YandexDiskApi:
         print("Введите имя папки, которую вы хотите создать, "
               "или нажмите Enter для использования имени по умолчанию 'image'.")
 
-        url = "https://cloud-api.yandex.net/v1/disk/resources"
+        url = f'{self.disk_url}resources'
         name_folder = self.name_folder if self.name_folder is not None \
             else self._request_folder_name()
         params = {
             "path": f'{name_folder}'
         }
-        response = requests.put(url, headers=self._common_headers(), params=params, timeout=5)
+        response = self._request_disk('PUT', url, params=params, timeout=5)
 
         if response.status_code == 201:
             logging.info(f"Папка '{self.name_folder}' успешно создана.")
+            self.listing.replace(name_folder, {})
         elif response.status_code == 409:
             logging.warning(f"Папка '{self.name_folder}' уже существует.")
         else:
@@ -100,6 +296,19 @@ class YandexDiskApi:
     def saving_photo_disk(self):
         """
         Загружает фотографии из локальной папки 'photo' на Яндекс.Диск в указанную папку.
+
+        Ссылки для загрузки запрашиваются заранее (не более href_ahead неиспользованных ссылок),
+        пока upload_workers файлов загружаются одновременно. Для каждого файла выводится
+        время загрузки, в конце - общая скорость.
+
+        Файлы, которые уже лежат в папке с тем же размером и MD5/SHA-256 (по кэшу
+        содержимого папки), не загружаются.
+        Скорость отправки ограничивается общим BandwidthShaper, если заданы лимиты.
+        При verify=True локальные копии удаляются только после проверки контрольных
+        сумм загруженных файлов (_verify_uploads).
+        Если папка 'photo' пуста (например, все фотографии уже сохранены), ничего
+        не загружается и счетчики остаются нулевыми.
+
         Raises:
             OSError: Если возникает ошибка доступа к локальной папке 'photo'.
             requests.exceptions.RequestException: Если возникает ошибка HTTP запроса
@@ -110,39 +319,704 @@ class YandexDiskApi:
         """
 
         name_files_list = self._list_files_in_directory()
-        url = 'https://cloud-api.yandex.net/v1/disk/resources/upload'
         self.name_folder if self.name_folder is not None else self.creating_folder()
 
-        if name_files_list:
-            for name_img in tqdm(name_files_list, desc="Загрузка фотографий", unit="фото"):
-                params = {
-                    "path": f'{self.name_folder}/{name_img}'
-                }
-                response = requests.get(url, headers=self._common_headers(),
-                                        params=params, timeout=2)
+        if not name_files_list:
+            print("Папка 'photo' пуста, загружать нечего.")
+            return
+
+        self._remote_listing()
+        results = queue.Queue()
+        ahead = threading.Semaphore(self.href_ahead)
+        total_bytes = 0
+        start = monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.href_ahead) as href_pool, \
+                ThreadPoolExecutor(max_workers=self.upload_workers) as upload_pool:
+
+            def feed():
+                in_flight, deferred = {}, []
+                for name_img in name_files_list:
+                    sha256 = self.index.file_hash(name_img, self._destination()) \
+                        if self.index is not None else None
+                    if self._file_on_disk(name_img, sha256):
+                        upload_pool.submit(self._upload_existing, name_img, results)
+                        continue
+                    if self._duplicate_of(sha256) is not None:
+                        upload_pool.submit(self._upload_duplicate, name_img, sha256, results)
+                        continue
+                    if self.dedup is not None and sha256 is not None and sha256 in in_flight:
+                        deferred.append((name_img, sha256))
+                        continue
+                    ahead.acquire()
+                    href_future = href_pool.submit(self._upload_href, name_img)
+                    in_flight[sha256] = upload_pool.submit(self._upload_file, name_img,
+                                                           href_future, ahead, results, sha256)
+                # Копии файлов из этого же запуска ждут загрузки первого экземпляра.
+                for name_img, sha256 in deferred:
+                    in_flight[sha256].exception()
+                    upload_pool.submit(self._upload_duplicate, name_img, sha256, results)
 
-                url_save = response.json()['href']
+            feeder = threading.Thread(target=feed, daemon=True)
+            feeder.start()
 
-                with open(f'photo/{name_img}', 'rb') as image:
-                    response_save = None
-                    while response_save is None or response_save.status_code != 201:
-                        response_save = requests.put(url_save, files={'file': image})
+            for _ in tqdm(name_files_list, desc="Загрузка фотографий", unit="фото"):
+                self.metrics.gauge('queue_depth', results.qsize(), queue='upload_results')
+                name_img, size, latency, transferred = results.get()
+                if size is not None and transferred:
+                    total_bytes += size
+                    with self._count_lock:
+                        self.uploaded_count += 1
+                    tqdm.write(f"Фото '{name_img}' успешно загружено на Яндекс.Диск "
+                               f"за {latency:.2f} с.")
+                elif size is None:
+                    self.failed_count += 1
+                    tqdm.write(f"Не удалось загрузить фото '{name_img}' на Яндекс.Диск.")
+            feeder.join()
 
-                        if response_save.status_code == 201:
-                            print(f"Фото '{name_img}' успешно загружено на Яндекс.Диск.")
-                            image.close()
-                            self._delete_uploaded_photos(name_img)
-                        else:
-                            print(f"Ошибка при загрузке фото '{name_img}': {response_save.text}")
+        self._verify_uploads(self._reupload_file)
 
+        elapsed = max(monotonic() - start, 1e-6)
+        print(f"Загружено {total_bytes / 2 ** 20:.1f} МБ, "
+              f"средняя скорость {total_bytes / elapsed / 2 ** 20:.2f} МБ/с")
+        if self.existing_count:
+            print(f"Уже были на Яндекс.Диске и не загружались: {self.existing_count}")
+        self.listing.save()
+
+    def _upload_file(self, name_img: str, href_future, ahead, results, sha256: str = None):
+        """
+        Загружает один файл из папки 'photo' по заранее запрошенной ссылке.
+
+        Файл отправляется телом PUT-запроса без multipart-обертки и читается с диска
+        блоками фиксированного размера. Перед каждой попыткой файл перематывается в начало.
+        MD5 и SHA-256 вычисляются при отправке; локальная копия удаляется после проверки
+        (см. _expect).
+
+        Args:
+            name_img (str): Имя файла в папке 'photo'.
+            href_future (Future or None): Результат запроса ссылки для загрузки;
+             если None, ссылка запрашивается здесь же.
+            ahead (threading.Semaphore or None): Освобождается, как только ссылка использована.
+            results (queue.Queue): Очередь, куда помещается (имя, размер или None, время).
+            sha256 (str, optional): SHA-256 файла для индекса дубликатов.
+        """
+        start = monotonic()
+        try:
+            url_save = href_future.result() if href_future is not None \
+                else self._upload_href(name_img)
+        except (requests.exceptions.RequestException, KeyError) as e:
+            print(f"Ошибка при получении ссылки для загрузки '{name_img}': {e}")
+            results.put((name_img, None, monotonic() - start, True))
+            return
+        finally:
+            if ahead is not None:
+                ahead.release()
+
+        size = None
+        try:
+            with open(f'photo/{name_img}', 'rb') as image, \
+                    self.metrics.span('upload', file=name_img):
+                for attempt in range(self.upload_retries + 1):
+                    if attempt:
+                        self.metrics.inc('retries_total', stage='upload', reason='failed')
+                        sleep(delay)
+                    image.seek(0)
+                    delay = backoff_delay(attempt)
+                    hashing = body = HashingFile(image)
+                    if self.shaper.limited:
+                        body = ThrottledFile(hashing, self.shaper, 'up',
+                                             self._upload_priority(name_img))
+                    try:
+                        response_save = self.http.put(url_save, data=body)
+                    except requests.exceptions.RequestException as e:
+                        print(f"Ошибка при загрузке фото '{name_img}': {e}")
+                        continue
+                    if response_save.status_code == 201:
+                        size = os.fstat(image.fileno()).st_size
+                        break
+                    if response_save.status_code in THROTTLE_STATUSES:
+                        delay = retry_after(response_save) or delay
+                    print(f"Ошибка при загрузке фото '{name_img}': {response_save.text}")
+        except OSError as e:
+            print(f"Ошибка при чтении файла '{name_img}': {e}")
+
+        if size is not None:
+            remote_path = f'{self.name_folder}/{name_img}'
+            sha256 = hashing.sha256.hexdigest()
+            if self.index is not None:
+                self.index.save_hash(sha256, remote_path, size, self._account())
+            self._expect(name_img, size, hashing.md5.hexdigest(), sha256,
+                         partial(self._confirm_file, name_img, remote_path, size, sha256))
+        results.put((name_img, size, monotonic() - start, True))
+
+    def _confirm_file(self, name_img: str, remote_path: str, size: int, sha256: str = None):
+        """
+        Завершает загрузку файла из папки 'photo': отмечает его в индексе и кэше
+        содержимого папки и удаляет локальную копию.
+
+        Args:
+            name_img (str): Имя файла в папке 'photo'.
+            remote_path (str): Путь файла на Яндекс.Диске.
+            size (int): Размер файла в байтах.
+            sha256 (str, optional): SHA-256 файла.
+        """
+        if self.index is not None:
+            self.index.mark_uploaded_file(name_img, remote_path, self._destination())
+        self.listing.put(self.name_folder, name_img, size, sha256=sha256)
+        self._delete_uploaded_photos(name_img)
+
+    def _reupload_file(self, name_img: str):
+        """
+        Повторно загружает файл из папки 'photo', не совпавший при проверке.
+
+        Args:
+            name_img (str): Имя файла в папке 'photo'.
+
+        Returns:
+            bool: True, если файл загружен.
+        """
+        results = queue.Queue()
+        self._upload_file(name_img, None, None, results)
+        uploaded = results.get()[1] is not None
+        with self._count_lock:
+            if uploaded:
+                self.uploaded_count += 1
+            else:
+                self.failed_count += 1
+        return uploaded
+
+    def _upload_duplicate(self, name_img: str, sha256: str, results):
+        """
+        Обрабатывает файл, содержимое которого уже есть на Яндекс.Диске: пропускает его
+        или копирует на сервере. Если это не удалось, загружает файл обычным способом.
+
+        Args:
+            name_img (str): Имя файла в папке 'photo'.
+            sha256 (str): SHA-256 файла.
+            results (queue.Queue): Очередь, куда помещается (имя, размер или None, время).
+        """
+        start = monotonic()
+        remote_path = self._deduplicate(name_img, sha256)
+        if remote_path is None:
+            self._upload_file(name_img, None, None, results, sha256)
+            return
+
+        try:
+            size = os.path.getsize(f'photo/{name_img}')
+        except OSError:
+            size = 0
+        if remote_path == f'{self.name_folder}/{name_img}':
+            # Копия на сервере проверяется так же, как загруженный файл.
+            self._expect(name_img, size, None, sha256,
+                         partial(self._confirm_file, name_img, remote_path, size, sha256),
+                         uploaded=False)
         else:
-            print("Папка 'photo' пуста")
-            sys.exit()
+            self.index.mark_uploaded_file(name_img, remote_path, self._destination())
+            self._delete_uploaded_photos(name_img)
+        results.put((name_img, size, monotonic() - start, False))
+
+    def _upload_existing(self, name_img: str, results):
+        """
+        Учитывает файл, который уже лежит в папке на Яндекс.Диске, без повторной загрузки.
+
+        Args:
+            name_img (str): Имя файла в папке 'photo'.
+            results (queue.Queue): Очередь, куда помещается (имя, размер, время).
+        """
+        size = self.listing.get(self.name_folder, name_img)['size']
+        if self.index is not None:
+            self.index.mark_uploaded_file(name_img, f'{self.name_folder}/{name_img}',
+                                          self._destination())
+        with self._dedup_lock:
+            self.existing_count += 1
+        self._delete_uploaded_photos(name_img)
+        results.put((name_img, size, 0.0, False))
+
+    def _remote_listing(self, force: bool = False):
+        """
+        Загружает в кэш содержимое папки name_folder, если его там нет или оно устарело.
+
+        Содержимое запрашивается постранично (GET resources с limit/offset) только с нужными
+        полями, поэтому для папки из N файлов выполняется N / listing_page запросов.
+
+        Args:
+            force (bool, optional): Запросить содержимое, даже если кэш актуален.
+             По умолчанию False.
+
+        Returns:
+            bool: False, если содержимое папки получить не удалось.
+        """
+        if self.name_folder is None or (not force and self.listing.fresh(self.name_folder)):
+            return True
+
+        url = f'{self.disk_url}resources'
+        fields = ','.join(f'_embedded.items.{field}'
+                          for field in ('name', 'type', 'size', 'md5', 'sha256'))
+        items, offset = {}, 0
+        while True:
+            params = {'path': self.name_folder, 'limit': self.listing_page, 'offset': offset,
+                      'fields': f'{fields},_embedded.total'}
+            try:
+                response = self._request_disk('GET', url, params=params, timeout=5)
+                if response.status_code == 404:
+                    break
+                response.raise_for_status()
+                embedded = response.json()['_embedded']
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                print(f"Не удалось получить содержимое папки '{self.name_folder}': {e}")
+                return False
+
+            for item in embedded.get('items', []):
+                if item.get('type') == 'file':
+                    items[item['name']] = {'size': item.get('size'), 'md5': item.get('md5'),
+                                           'sha256': item.get('sha256')}
+            offset += self.listing_page
+            if offset >= embedded.get('total', 0) or not embedded.get('items'):
+                break
+
+        self.listing.replace(self.name_folder, items)
+        return True
+
+    def _remote_file(self, name_img: str):
+        """
+        Запрашивает сведения об одном файле папки name_folder (GET resources), не загружая
+        содержимое всей папки.
+
+        Args:
+            name_img (str): Имя файла.
+
+        Returns:
+            dict or None: {'size', 'md5', 'sha256'} или None, если файла нет или сведения
+             получить не удалось.
+        """
+        params = {'path': f'{self.name_folder}/{name_img}', 'fields': 'type,size,md5,sha256'}
+        try:
+            response = self._request_disk('GET', f'{self.disk_url}resources', params=params,
+                                          timeout=5)
+            if response.status_code != 200 or response.json().get('type') != 'file':
+                return None
+            item = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            tqdm.write(f"Не удалось получить сведения о файле '{name_img}': {e}")
+            return None
+        return {'size': item.get('size'), 'md5': item.get('md5'), 'sha256': item.get('sha256')}
+
+    def _matches_remote(self, name_img: str, size: int, sha256: str = None, md5: str = None,
+                        entry: dict = None):
+        """
+        Проверяет по кэшу, что в папке name_folder уже есть файл с тем же содержимым.
+
+        Args:
+            name_img (str): Имя файла.
+            size (int): Размер файла в байтах.
+            sha256 (str, optional): SHA-256 содержимого.
+            md5 (str, optional): MD5 содержимого.
+            entry (dict, optional): Сведения о файле на Яндекс.Диске (_remote_file).
+             По умолчанию берутся из кэша содержимого папки.
+
+        Returns:
+            bool: True, если совпадают размер и SHA-256 (или MD5, если SHA-256 неизвестен).
+        """
+        if entry is None:
+            entry = self.listing.get(self.name_folder, name_img)
+        if entry is None or entry['size'] != size:
+            return False
+        if sha256 and entry.get('sha256'):
+            return entry['sha256'] == sha256
+        if md5 and entry.get('md5'):
+            return entry['md5'] == md5
+        return False
+
+    def _expect(self, name_img: str, size: int, md5: str, sha256: str, confirm,
+                uploaded: bool = True):
+        """
+        Запоминает загруженный файл для проверки контрольных сумм (_verify_uploads).
+
+        Если проверка выключена (verify=False), сразу вызывает confirm.
+
+        Args:
+            name_img (str): Имя файла в папке name_folder.
+            size (int): Размер отправленного файла в байтах.
+            md5 (str or None): MD5, вычисленный при отправке.
+            sha256 (str or None): SHA-256, вычисленный при отправке.
+            confirm (Callable[[], None]): Вызывается после успешной проверки: отмечает файл
+             в индексе и удаляет локальную копию.
+            uploaded (bool, optional): Файл учтен в uploaded_count (False - копия
+             на сервере, учтенная в dedup_count). По умолчанию True.
+        """
+        if not self.verify:
+            confirm()
+            return
+        with self._unverified_lock:
+            self._unverified[name_img] = {'size': size, 'md5': md5, 'sha256': sha256,
+                                          'confirm': confirm, 'uploaded': uploaded}
+
+    def _check_remote(self, name_img: str, upload: dict):
+        """
+        Сравнивает загруженный файл со сведениями из кэша содержимого папки.
+
+        Args:
+            name_img (str): Имя файла.
+            upload (dict): {'size', 'md5', 'sha256'} отправленного файла.
+
+        Returns:
+            bool or None: True - совпадает, False - отличается или отсутствует,
+             None - Яндекс.Диск еще не вычислил контрольные суммы.
+        """
+        entry = self.listing.get(self.name_folder, name_img)
+        if entry is None or entry['size'] != upload['size']:
+            return False
+        if entry.get('sha256') and upload['sha256']:
+            return entry['sha256'] == upload['sha256']
+        if entry.get('md5') and upload['md5']:
+            return entry['md5'] == upload['md5']
+        return None
+
+    def _verify_uploads(self, reupload):
+        """
+        Проверяет загруженные файлы по контрольным суммам Яндекс.Диска.
+
+        Содержимое папки name_folder запрашивается постранично (_remote_listing) одним
+        проходом для всех файлов, и размер и SHA-256 (или MD5) каждого файла сравниваются
+        с вычисленными при отправке. Для совпавших файлов вызывается confirm (отметка
+        в индексе, удаление локальной копии). Несовпавшие и отсутствующие файлы загружаются
+        повторно функцией reupload и проверяются в следующем проходе (всего не больше
+        upload_retries + 1 проходов). Файлы без контрольных сумм проверяются снова через
+        verify_delay секунд. Для непроверенных файлов локальные копии сохраняются.
+
+        Args:
+            reupload (Callable[[str], bool]): Повторная загрузка файла по имени
+             (сама учитывает uploaded_count и failed_count).
+        """
+        checked = 0
+        for attempt in range(self.upload_retries + 1):
+            if not self._unverified:
+                break
+            if attempt:
+                sleep(self.verify_delay)
+            if not self._remote_listing(force=True):
+                continue
+
+            with self._unverified_lock:
+                expected = dict(self._unverified)
+            mismatched = []
+            copies = 0
+            for name_img, upload in expected.items():
+                matches = self._check_remote(name_img, upload)
+                if matches is None:
+                    continue
+                with self._unverified_lock:
+                    del self._unverified[name_img]
+                checked += 1
+                self.metrics.inc('verify_total', result='ok' if matches else 'mismatch')
+                if matches:
+                    self.verified_count += 1
+                    upload['confirm']()
+                else:
+                    mismatched.append(name_img)
+                    copies += not upload['uploaded']
+                    if self.index is not None and upload['sha256'] and \
+                            self.index.remote_for_hash(upload['sha256'], self._account()) == \
+                            f'{self.name_folder}/{name_img}':
+                        self.index.drop_hash(upload['sha256'], self._account())
+            if not mismatched:
+                continue
+
+            self.mismatch_count += len(mismatched)
+            self.uploaded_count -= len(mismatched) - copies
+            self.dedup_count -= copies
+            retry = attempt < self.upload_retries
+            for name_img in mismatched:
+                tqdm.write(f"Фото '{name_img}' на Яндекс.Диске не совпадает с отправленным"
+                           f"{', загружаем повторно' if retry else ''}.")
+            if retry:
+                self._overwrite.update(mismatched)
+                with ThreadPoolExecutor(max_workers=self.upload_workers) as pool:
+                    list(pool.map(reupload, mismatched))
+                self._overwrite.difference_update(mismatched)
+            else:
+                self.failed_count += len(mismatched)
+
+        if checked:
+            print(f"Проверено контрольных сумм: {checked}, совпало: {self.verified_count}, "
+                  f"не совпало: {self.mismatch_count}")
+        with self._unverified_lock:
+            if self._unverified:
+                print(f"Не удалось проверить {len(self._unverified)} файлов, "
+                      f"локальные копии сохранены.")
+                self._unverified.clear()
+
+    def _file_on_disk(self, name_img: str, sha256: str = None):
+        """
+        Проверяет, что локальный файл из папки 'photo' уже загружен в папку name_folder.
+
+        Файл хэшируется только если в кэше есть файл с тем же именем и размером.
+
+        Args:
+            name_img (str): Имя файла в папке 'photo'.
+            sha256 (str, optional): Известный SHA-256 файла.
+
+        Returns:
+            bool: True, если файл можно не загружать.
+        """
+        entry = self.listing.get(self.name_folder, name_img)
+        try:
+            if entry is None or entry['size'] != os.path.getsize(f'photo/{name_img}'):
+                return False
+            md5 = hashlib.md5()
+            digest = hashlib.sha256()
+            with open(f'photo/{name_img}', 'rb') as image:
+                for chunk in iter(lambda: image.read(64 * 1024), b''):
+                    md5.update(chunk)
+                    digest.update(chunk)
+        except OSError:
+            return False
+        return self._matches_remote(name_img, entry['size'], sha256 or digest.hexdigest(),
+                                    md5.hexdigest())
+
+    def _duplicate_of(self, sha256: str):
+        """
+        Ищет уже загруженный на этот Яндекс.Диск файл с тем же содержимым
+        (если включена дедупликация).
+
+        Args:
+            sha256 (str or None): SHA-256 содержимого.
+
+        Returns:
+            str or None: Путь файла на Яндекс.Диске или None.
+        """
+        if self.dedup is None or self.index is None or sha256 is None:
+            return None
+        return self.index.remote_for_hash(sha256, self._account())
+
+    def _deduplicate(self, name_img: str, sha256: str):
+        """
+        Не загружает файл, если файл с тем же содержимым уже есть на Яндекс.Диске.
+
+        При dedup='copy' файл копируется на сервере (resources/copy) в папку name_folder,
+        при dedup='skip' фотография ссылается на уже загруженный файл.
+
+        Args:
+            name_img (str): Имя файла на Яндекс.Диске.
+            sha256 (str or None): SHA-256 содержимого.
+
+        Returns:
+            str or None: Путь файла с этим содержимым на Яндекс.Диске или None,
+             если файл нужно загрузить.
+        """
+        source = self._duplicate_of(sha256)
+        if source is None:
+            return None
+
+        target = f'{self.name_folder}/{name_img}'
+        if self.dedup == 'copy' and source != target:
+            if not self._copy_resource(source, target):
+                self.index.drop_hash(sha256, self._account())
+                return None
+            source = target
+
+        with self._dedup_lock:
+            self.dedup_count += 1
+        tqdm.write(f"Фото '{name_img}' уже есть на Яндекс.Диске ({source}), "
+                   f"повторная загрузка не нужна.")
+        return source
+
+    def _copy_resource(self, source: str, target: str):
+        """
+        Копирует файл на Яндекс.Диске без передачи содержимого через этот хост.
+
+        Args:
+            source (str): Путь исходного файла.
+            target (str): Путь копии.
+
+        Returns:
+            bool: True, если копия создана (или уже существует).
+        """
+        url_copy = f'{self.disk_url}resources/copy'
+        try:
+            response = self._request_disk('POST', url_copy,
+                                          params={'from': source, 'path': target}, timeout=5)
+            if response.status_code in (201, 409):
+                return True
+            if response.status_code == 202:
+                href = response.json()['href']
+                started = monotonic()
+                while monotonic() - started < self.operation_timeout:
+                    status = self._operation_status(href)
+                    if status in ('success', 'failed'):
+                        return status == 'success'
+                    sleep(self.poll_interval)
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            tqdm.write(f"Ошибка при копировании '{source}' в '{target}': {e}")
+        return False
+
+    def _upload_href(self, name_img: str):
+        """
+        Запрашивает ссылку для загрузки файла в папку name_folder на Яндекс.Диске.
+
+        Файлы, загружаемые повторно после проверки, перезаписываются (overwrite).
+
+        Args:
+            name_img (str): Имя файла на Яндекс.Диске.
+
+        Returns:
+            str: URL, на который нужно отправить тело файла методом PUT.
+        """
+        url = f'{self.disk_url}resources/upload'
+        params = {
+            "path": f'{self.name_folder}/{name_img}'
+        }
+        if name_img in self._overwrite:
+            params['overwrite'] = 'true'
+        response = self._request_disk('GET', url, params=params, timeout=2)
+        return response.json()['href']
+
+    def _upload_priority(self, name_img: str):
+        """
+        Определяет класс приоритета загрузки файла для ограничения скорости.
+
+        Args:
+            name_img (str): Имя файла на Яндекс.Диске.
+
+        Returns:
+            int: METADATA для JSON-файлов (манифестов), иначе BULK.
+        """
+        if name_img.endswith('.json'):
+            return self.shaper.METADATA
+        return self.shaper.BULK
+
+    def _upload_stream(self, name_img: str, chunks, timeout=5):
+        """
+        Загружает файл на Яндекс.Диск из итератора блоков байт, не сохраняя его локально.
+
+        Тело отправляется с Transfer-Encoding: chunked, поэтому в памяти одновременно
+        находится только текущий блок. Скорость отправки ограничивается shaper.
+
+        Args:
+            name_img (str): Имя файла на Яндекс.Диске.
+            chunks (Iterable[bytes]): Итератор блоков содержимого файла.
+            timeout (float or tuple, optional): Таймаут запроса PUT. По умолчанию 5 с.
+
+        Returns:
+            bool: True, если файл успешно загружен.
+        """
+        try:
+            url_save = self._upload_href(name_img)
+            response_save = self.http.put(
+                url_save, data=self.shaper.throttle(chunks, 'up', self._upload_priority(name_img)),
+                timeout=timeout)
+        except (requests.exceptions.RequestException, KeyError) as e:
+            tqdm.write(f"Ошибка при загрузке фото '{name_img}': {e}")
+            return False
+
+        if response_save.status_code == 201:
+            tqdm.write(f"Фото '{name_img}' успешно загружено на Яндекс.Диск.")
+            return True
+        tqdm.write(f"Ошибка при загрузке фото '{name_img}': {response_save.text}")
+        return False
+
+    def remote_upload(self, url_photos):
+        """
+        Загружает фотографии на Яндекс.Диск по URL: файл скачивает сам Яндекс.Диск.
+
+        Одновременно выполняется не более max_operations операций; статусы всех
+        незавершенных операций опрашиваются параллельно раз в poll_interval секунд.
+
+        Args:
+            url_photos (Iterable[tuple]): Пары (ID фото, URL для скачивания).
+
+        Yields:
+            tuple: (ID фото, URL, True/False) по мере завершения операций. Для неудачных
+             операций фотографию нужно передать обычным способом.
+        """
+        in_flight = {}
+        pairs = iter(url_photos)
+        exhausted = False
+
+        with ThreadPoolExecutor(max_workers=self.upload_workers) as pollers:
+            while not exhausted or in_flight:
+                while not exhausted and len(in_flight) < self.max_operations:
+                    try:
+                        id_photo, url = next(pairs)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    href = self._upload_by_url(f'photo_{id_photo}.jpg', url)
+                    if href is None:
+                        yield id_photo, url, False
+                    else:
+                        in_flight[id_photo] = (href, url, monotonic())
+
+                self.metrics.gauge('queue_depth', len(in_flight), queue='operations')
+                if not in_flight:
+                    continue
+                statuses = list(pollers.map(self._operation_status,
+                                            [href for href, _, _ in in_flight.values()]))
+                for id_photo, status in zip(list(in_flight), statuses):
+                    href, url, started = in_flight[id_photo]
+                    if status == 'success':
+                        del in_flight[id_photo]
+                        yield id_photo, url, True
+                    elif status == 'failed' or \
+                            monotonic() - started > self.operation_timeout:
+                        del in_flight[id_photo]
+                        yield id_photo, url, False
+                if in_flight:
+                    sleep(self.poll_interval)
+
+    def _upload_by_url(self, name_img: str, url: str):
+        """
+        Запускает на Яндекс.Диске операцию загрузки файла по URL.
+
+        Args:
+            name_img (str): Имя файла на Яндекс.Диске.
+            url (str): URL, откуда Яндекс.Диск скачает файл.
+
+        Returns:
+            str or None: Ссылка на операцию или None, если операция не запущена.
+        """
+        url_upload = f'{self.disk_url}resources/upload'
+        params = {
+            "path": f'{self.name_folder}/{name_img}',
+            "url": url
+        }
+        try:
+            response = self._request_disk('POST', url_upload, params=params, timeout=5)
+            if response.status_code == 202:
+                return response.json()['href']
+            if response.status_code == 409:
+                tqdm.write(f"Фото '{name_img}' уже есть в папке на Яндекс.Диске.")
+                return None
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            tqdm.write(f"Ошибка при загрузке фото '{name_img}' по URL: {e}")
+            return None
+        tqdm.write(f"Яндекс.Диск не принял загрузку '{name_img}' по URL: {response.text}")
+        return None
+
+    def _operation_status(self, href: str):
+        """
+        Запрашивает статус асинхронной операции Яндекс.Диска.
+
+        Args:
+            href (str): Ссылка на операцию.
+
+        Returns:
+            str or None: 'success', 'failed', 'in-progress' или None при ошибке запроса.
+        """
+        try:
+            response = self._request_disk('GET', href, timeout=5)
+            return response.json().get('status')
+        except (requests.exceptions.RequestException, ValueError) as e:
+            tqdm.write(f"Ошибка при запросе статуса операции: {e}")
+            return None
 
     def _list_files_in_directory(self):
         """
         Сканирует локальную папку 'photo' на наличие файлов.
 
+        Недокачанные файлы '*.part' (например, оставшиеся после аварийного завершения,
+        см. VkApi._save_stream) не возвращаются.
+
         Returns:
             list: Список имен файлов в папке 'photo'.
 
@@ -156,7 +1030,8 @@ class YandexDiskApi:
             if not os.path.isdir(photo_dir):
                 raise ValueError(f"Папка '{photo_dir}' не существует или не является директорией.")
             files = os.listdir(photo_dir)
-            name_files = [f for f in files if os.path.isfile(os.path.join(photo_dir, f))]
+            name_files = [f for f in files if os.path.isfile(os.path.join(photo_dir, f))
+                          and not f.endswith('.part')]
             return name_files
         except OSError as e:
             print(f"Ошибка при сканировании папки '{photo_dir}': {e}")